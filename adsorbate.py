@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import NELECT
+import prescreen
+from layers import build_selective_dynamics
+from NELECT import set_nelect
+from zval_cache import ZvalCache
+from sites import site_position
+from slab import label_surface, write_relax_input, NUM_TOP_LAYERS, RELAX_INCAR
+
+warnings.simplefilter("ignore")
+
+ADSORPTION_DISTANCE = 2.4  # 吸附物第一个原子距位点的高度（Å）
+FAR_DISTANCE = 10  # far 参考结构中吸附物距位点的高度（Å）
+# 批量生成输入时的进程数（NETCHG_BUILD_WORKERS），默认为 CPU 核数
+BUILD_WORKERS = int(os.environ.get("NETCHG_BUILD_WORKERS", os.cpu_count() or 1))
+
+
+def relax_dir(adsorbate_name, calc_name, far=False):
+    """
+    吸附计算目录：../{adsorbate_name}/{calc_name}，far 参考为 ../{adsorbate_name}/far-{calc_name}。
+    """
+    return os.path.join('..', adsorbate_name, ('far-' if far else '') + calc_name)
+
+
+def far_settings_hash(num_top_layers=NUM_TOP_LAYERS):
+    """
+    far 参考结构计算设置（RELAX_INCAR、放开层数、FAR_DISTANCE）的摘要，设置改变时使用新的 far 参考。
+    """
+    settings = {"incar": RELAX_INCAR, "num_top_layers": int(num_top_layers), "distance": FAR_DISTANCE}
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:8]
+
+
+def far_reference_name(support_name, net_charge, num_top_layers=NUM_TOP_LAYERS):
+    """
+    far 参考的计算目录名（不含 far- 前缀）：{support}_q{电荷}_{设置摘要}。
+    吸附物距表面 FAR_DISTANCE，能量与位点无关，同一 (材料, 吸附物, 电荷, 设置) 只计算一次，各位点共用。
+    """
+    return f"{support_name}_q{int(net_charge)}_{far_settings_hash(num_top_layers)}"
+
+
+def far_reference_dir(support_name, adsorbate_name, net_charge, calc_name=None, num_top_layers=NUM_TOP_LAYERS):
+    """
+    查找 far 参考目录：已有旧布局的 ../{adsorbate_name}/far-{calc_name} 时使用它，
+    否则为 ../{adsorbate_name}/far-{far_reference_name(...)}。
+    """
+    if calc_name:
+        legacy = relax_dir(adsorbate_name, calc_name, far=True)
+        if os.path.isdir(legacy):
+            return legacy
+    return relax_dir(adsorbate_name, far_reference_name(support_name, net_charge, num_top_layers), far=True)
+
+
+def place_adsorbate(structure, molecule, site_coords, distance=ADSORPTION_DISTANCE):
+    """
+    将吸附物第一个原子放在位点正上方 distance 处，吸附物原子标记为 `adsorbate`。
+
+    :param structure: 已标记 surface_properties 的基底结构（原地修改）
+    :param molecule: 吸附物分子（原地平移）
+    :param site_coords: 位点的笛卡尔坐标，见 sites.site_position
+    :return: 按元素排序后的新结构
+    """
+    indices = list(range(len(molecule)))
+
+    # 将吸附物平移到原点 (0, 0, 0)，再平移到位点上方
+    molecule.translate_sites(indices=indices, vector=-np.array(molecule[0].coords))
+    molecule.translate_sites(indices=indices, vector=[site_coords[0], site_coords[1], site_coords[2] + distance])
+    print(f" ads_atom {molecule[0].specie}, {molecule[0].coords}")
+    print(f" site {site_coords}\n")
+
+    # 将吸附物的原子逐个添加到基底上，标记为 `adsorbate`
+    for site in molecule:
+        structure.append(site.specie, site.coords, coords_are_cartesian=True,
+                         properties={"surface_properties": "adsorbate"})
+    return structure.get_sorted_structure()
+
+
+def support_template(support_name, num_top_layers=NUM_TOP_LAYERS):
+    """
+    读取 ./{support_name}/CONTCAR 并标记表面层，作为该基底所有吸附结构的模板。
+    """
+    from pymatgen.core import Structure
+
+    structure = Structure.from_file(os.path.join('.', support_name, 'CONTCAR'))
+    label_surface(structure, int(num_top_layers))
+    return structure
+
+
+def adsorbate_structure(support_name, adsorbate_name, num_top_layers=NUM_TOP_LAYERS, site_index=0, far=False,
+                        template=None):
+    """
+    由 ./{support_name}/CONTCAR 与 ./{adsorbate_name}.xyz 构建吸附结构：
+    表面原子与吸附物原子动，次表面及其他组别不动。
+
+    :param site_index: 位点的原子编号，或 sites.py 枚举的位点标签（如 hollow0）
+    :param far: 为 True 时生成 far 参考结构（吸附物距表面 FAR_DISTANCE）
+    :param template: support_template 的结果（不修改），None 时读取 CONTCAR
+    :return: 带 selective_dynamics 的 Structure
+    :raises ValueError: 启用 prescreen.PRESCREEN 且吸附物在所有取向与高度下都与基底重叠
+    """
+    from pymatgen.core import Molecule
+
+    structure = template.copy() if template is not None else support_template(support_name, num_top_layers)
+    molecule = Molecule.from_file(os.path.join('.', adsorbate_name + '.xyz'))
+
+    site_coords = site_position(structure, support_name, site_index)
+    if prescreen.PRESCREEN and not far:
+        # 预筛选：去掉与基底重叠的取向与高度，选能量最低的构型并用本地计算器预优化，全部重叠时不生成计算
+        calculator = prescreen.load_calculator()
+        molecule, distance = prescreen.best_placement(structure, molecule, site_coords, calculator=calculator)
+        structure = place_adsorbate(structure, molecule, site_coords, distance)
+        prescreen.prerelax(structure, calculator)
+    else:
+        structure = place_adsorbate(structure, molecule, site_coords, FAR_DISTANCE if far else ADSORPTION_DISTANCE)
+
+    group = structure.site_properties["surface_properties"]
+    structure.add_site_property("selective_dynamics",
+                                build_selective_dynamics(group, movable=("surface", "adsorbate")))
+    return structure
+
+
+def build_adsorbate(support_name, adsorbate_name, net_charge, num_top_layers=NUM_TOP_LAYERS, site_index=0,
+                    calc_name=None, far=False):
+    """
+    生成吸附结构优化输入 ../{adsorbate_name}/{calc_name}，并按净电荷写入 NELECT。
+
+    :param support_name: 催化剂名称，例如 Fe, FePc, Fe2O3, Fe-MOF 等催化剂
+    :param adsorbate_name: 吸附物名称，例如 OOH, OH, CO2, N2, SO4, benzene 等吸附物
+    :param net_charge: 净电荷
+    :param num_top_layers: 打算放开催化剂的 top 原子层数
+    :param site_index: 位点的原子编号，或 sites.py 枚举的位点标签（如 hollow0）
+    :param calc_name: 计算目录名，默认与催化剂名称相同；同一催化剂有多个位点或电荷时用于区分目录
+    :param far: 为 True 时生成 far 参考结构，目录为 ../{adsorbate_name}/far-{calc_name}
+    :return: 计算目录路径
+    """
+    return build_adsorbate_charges(support_name, adsorbate_name, {calc_name or support_name: net_charge},
+                                   num_top_layers, site_index, far)[0]
+
+
+def build_adsorbate_charges(support_name, adsorbate_name, charges, num_top_layers=NUM_TOP_LAYERS, site_index=0,
+                            far=False, template=None):
+    """
+    电荷扫描：吸附结构与 VASP 输入只生成一次，再复制到各电荷的计算目录，各目录只有 INCAR 中的 NELECT 不同。
+
+    :param charges: {计算目录名: 净电荷}
+    :param template: support_template 的结果，None 时读取 CONTCAR
+    :return: 计算目录路径列表，顺序与 charges 一致
+    """
+    structure = adsorbate_structure(support_name, adsorbate_name, num_top_layers, site_index, far, template)
+    relax_paths = [relax_dir(adsorbate_name, calc_name, far) for calc_name in charges]
+
+    # 生成 vasp 输入文件，其余电荷的目录直接复制
+    relax = write_relax_input(structure, relax_paths[0])
+    for relax_path in relax_paths[1:]:
+        shutil.copytree(relax_paths[0], relax_path, dirs_exist_ok=True)
+
+    # 由内存中的结构计算 NELECT 参数并写入到 INCAR
+    for relax_path, net_charge in zip(relax_paths, charges.values()):
+        nelect = set_nelect(relax_path, net_charge, relax.potcar_symbols, relax.poscar.natoms)
+        print(f"NELECT = {nelect} has been written to {relax_path}/INCAR.")
+    return relax_paths
+
+
+def _init_worker():
+    # fork 出的进程不能沿用父进程的 SQLite 连接，ZVAL 缓存在各进程中重新连接
+    NELECT.ZVAL_CACHE = ZvalCache(NELECT.ZVAL_CACHE.path)
+
+
+def _try_build(*args):
+    try:
+        return build_adsorbate_charges(*args)
+    except Exception as e:
+        return e
+
+
+def build_adsorbates(support_name, jobs, num_top_layers=NUM_TOP_LAYERS, site_index=0, workers=BUILD_WORKERS):
+    """
+    批量生成同一基底、同一位点上多个吸附物（及 far 参考）的输入：CONTCAR 只读取一次、表面层只标记一次，
+    各吸附物的结构、VASP 输入与 NELECT 在进程池中并行生成。某个吸附物失败不影响其他吸附物。
+
+    :param jobs: [(吸附物名称, {计算目录名: 净电荷}, far), ...]
+    :param workers: 进程数，为 1 或只有一项时在当前进程中依次生成
+    :return: 与 jobs 顺序一致的列表，每项为计算目录路径列表，生成失败时为该异常
+    """
+    template = support_template(support_name, num_top_layers)
+    args = [(support_name, adsorbate_name, charges, num_top_layers, site_index, far, template)
+            for adsorbate_name, charges, far in jobs]
+    workers = max(1, min(workers, len(args)))
+    if workers == 1:
+        return [_try_build(*arg) for arg in args]
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        return list(pool.map(_try_build, *zip(*args)))
+
+
+def main(argv, far=False):
+    # 用法: python adsorbate-NELECT.py <support> <adsorbate> <net_charge> <num_top_layers> <site_index> [calc_name]
+    support_name, adsorbate_name, net_charge, num_top_layers, site_index = argv[1:6]
+    calc_name = argv[6] if len(argv) > 6 else support_name
+    build_adsorbate(support_name, adsorbate_name, int(net_charge), int(num_top_layers), site_index, calc_name,
+                    far=far)
+
+
+def batch_main(argv):
+    # 用法: python batch-adsorbate.py <support> <adsorbate1,adsorbate2,...> <net_charge> <num_top_layers> <site_index>
+    #       [calc_name] [--workers N]    净电荷不为 0 时同时生成 far 参考结构
+    args = list(argv[1:])
+    workers = BUILD_WORKERS
+    if "--workers" in args:
+        position = args.index("--workers")
+        workers = int(args[position + 1])
+        del args[position:position + 2]
+    support_name, adsorbate_names, net_charge, num_top_layers, site_index = args[:5]
+    calc_name = args[5] if len(args) > 5 else support_name
+    net_charge = int(net_charge)
+    jobs = [(adsorbate_name, {calc_name: net_charge}, far) for adsorbate_name in adsorbate_names.split(',')
+            for far in ((False, True) if net_charge != 0 else (False,))]
+    failed = 0
+    for (adsorbate_name, _, far), result in zip(jobs, build_adsorbates(support_name, jobs, int(num_top_layers),
+                                                                         site_index, workers)):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"Failed to build {relax_dir(adsorbate_name, calc_name, far)}: {result}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,31 @@
+#!/bin/sh
+# 以一个 SLURM job array 提交多个计算目录：第 i 个任务在列表第 i+1 行的目录中运行 VASP
+# 用法: array-subvasp.sh <dirlist> [indices]
+#   dirlist: 每行一个计算目录（绝对路径，或相对于当前目录）
+#   indices: 只提交这些任务，如 "3,7-9"（重新提交失败的任务），默认全部
+# 集群相关设置通过环境变量传入：
+#   VASP_CMD     VASP 运行命令，默认 "mpirun vasp_gam"
+#   SBATCH_OPTS  sbatch 的其他参数，如 "-p normal -N 1 --ntasks-per-node=64"
+list="$1"
+if [ ! -s "$list" ]; then
+    echo "Empty or missing directory list: $list"
+    exit 1
+fi
+n=$(wc -l < "$list")
+indices="${2:-0-$((n - 1))}"
+DIRLIST="$(cd "$(dirname "$list")" && pwd)/$(basename "$list")"
+VASP_CMD="${VASP_CMD:-mpirun vasp_gam}"
+export DIRLIST VASP_CMD
+
+# 每个任务的输出写入各自目录的 slurm-<作业号>_<任务号>.out，与单个作业的 slurm-*.out 检查方式一致
+sbatch $SBATCH_OPTS --array="$indices" -J "$(basename "$list" .list)" -o /dev/null <<'JOB'
+#!/bin/sh
+dir=$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" "$DIRLIST")
+case "$dir" in
+    /*) ;;
+    *) dir="$SLURM_SUBMIT_DIR/$dir" ;;
+esac
+cd "$dir" || exit 1
+exec > "slurm-${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}.out" 2>&1
+$VASP_CMD
+JOB
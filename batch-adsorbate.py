@@ -0,0 +1,8 @@
+import sys
+
+from adsorbate import batch_main
+
+# 批量生成吸附结构优化输入：基底 CONTCAR 只读取一次，各吸附物（净电荷不为 0 时含 far 参考）在进程池中并行生成
+# Usage: python batch-adsorbate.py <support> <adsorbate1,adsorbate2,...> <net_charge> <num_top_layers> <site_index> [calc_name] [--workers N]
+if __name__ == "__main__":
+    exit(batch_main(sys.argv))
@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import builtins
+import resource
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+
+# 端到端流程吞吐量基准：用 fake_vasp.py 代替 VASP、本地进程池代替 SLURM，
+# 让 N 个材料 × M 个吸附物走完 slab -> ads (-> far) -> thermal -> binding 全部阶段。
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 统计的文件系统操作：os.path.isfile / isdir / getmtime 等都经由 os.stat，glob 经由 os.scandir
+FS_OPERATIONS = {
+    "open": (builtins, "open"),
+    "stat": (os, "stat"),
+    "scandir": (os, "scandir"),
+    "listdir": (os, "listdir"),
+    "makedirs": (os, "makedirs"),
+    "replace": (os, "replace"),
+    "copy": (shutil, "copy"),
+    "copytree": (shutil, "copytree"),
+}
+
+INCAR_TEMPLATE = "ALGO = Normal\nIBRION = 2\nNSW = 400\nISIF = 1\nEDIFFG = -0.02\n"
+POSCAR_TEMPLATE = "fake\n1.0\n10 0 0\n0 10 0\n0 0 20\nFe O H\n4 1 1\nCartesian\n" + "0 0 0\n" * 6
+# 频率计算的 POSCAR：只有吸附物（O、H）可以移动
+THERMAL_POSCAR = "fake\n1.0\n10 0 0\n0 10 0\n0 0 20\nFe O H\n4 1 1\nSelective dynamics\nCartesian\n" + \
+    "0 0 0 F F F\n" * 4 + "0 0 2 T T T\n0 0 3 T T T\n"
+POTCAR_TEMPLATE = "".join(f" TITEL = PAW_PBE {symbol}\n POMASS = {mass}; ZVAL = {zval}\n End of Dataset\n"
+                          for symbol, mass, zval in (("Fe", 55.847, 8.0), ("O", 16.0, 6.0), ("H", 1.0, 1.0)))
+MOLECULE_OUTCAR = "  energy  without entropy=     {0:.8f}  energy(sigma->0) =     {0:.8f}\n Total CPU time used (sec): 1.0\n"
+
+
+@contextmanager
+def count_fs_operations(counts):
+    """
+    在上下文中统计本进程的文件系统调用次数（不包括子进程）。
+    """
+    originals = {}
+    for name, (module, attribute) in FS_OPERATIONS.items():
+        original = getattr(module, attribute)
+        originals[name] = original
+
+        def counted(*args, _name=name, _original=original, **kwargs):
+            counts[_name] = counts.get(_name, 0) + 1
+            return _original(*args, **kwargs)
+
+        setattr(module, attribute, counted)
+    try:
+        yield counts
+    finally:
+        for name, (module, attribute) in FS_OPERATIONS.items():
+            setattr(module, attribute, originals[name])
+
+
+@contextmanager
+def quiet_stdout(enabled):
+    # 同时屏蔽子进程（backup.sh / r2t.sh）的输出
+    if not enabled:
+        yield
+        return
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def write_inputs(directory, nelect=None):
+    os.makedirs(directory, exist_ok=True)
+    incar = INCAR_TEMPLATE + (f"  NELECT = {nelect}\n" if nelect is not None else "")
+    for name, text in (("INCAR", incar), ("POSCAR", POSCAR_TEMPLATE), ("KPOINTS", "Gamma\n"),
+                       ("POTCAR", POTCAR_TEMPLATE)):
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(text)
+    return directory
+
+
+# 代替 pymatgen 的输入生成：只测量流程调度本身
+def fake_build_slab(support_name, num_top_layers=3, verbose=True):
+    return write_inputs(os.path.join(".", support_name))
+
+
+def fake_build_adsorbate_charges(support_name, adsorbate_name, charges, num_top_layers=3, site_index=0, far=False):
+    return [write_inputs(os.path.join("..", adsorbate_name, ("far-" if far else "") + calc_name), 64 - charge)
+            for calc_name, charge in charges.items()]
+
+
+def fake_build_adsorbate(support_name, adsorbate_name, net_charge, num_top_layers=3, site_index=0, calc_name=None,
+                         far=False):
+    return fake_build_adsorbate_charges(support_name, adsorbate_name, {calc_name or support_name: net_charge},
+                                        num_top_layers, site_index, far)[0]
+
+
+def fake_build_adsorbates(support_name, jobs, num_top_layers=3, site_index=0, workers=1):
+    return [fake_build_adsorbate_charges(support_name, adsorbate_name, charges, num_top_layers, site_index, far)
+            for adsorbate_name, charges, far in jobs]
+
+
+def fake_build_thermal(support_name, adsorbate_name, site_index, calc_name=None):
+    # r2t.sh 已将 CONTCAR 复制为 2-thermal 目录中的 POSCAR，这里只设置 selective_dynamics
+    path = os.path.join("..", adsorbate_name, "2-thermal", calc_name or support_name, "POSCAR")
+    with open(path, "w") as f:
+        f.write(THERMAL_POSCAR)
+    return path
+
+
+# 流程调用的外部脚本，复制到基准目录的 bin 中并设为可执行
+SHELL_SCRIPTS = ("backup.sh", "r2t.sh", "rcheck.sh", "array-subvasp.sh")
+
+
+def setup_project(root, materials, adsorbates):
+    """
+    创建基准项目目录：root/Support 下的材料与分子参考（分子 OUTCAR 直接写出），root/bin 下的外部脚本。
+    """
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    for script in SHELL_SCRIPTS:
+        shutil.copy(os.path.join(REPO_DIR, script), bin_dir)
+        os.chmod(os.path.join(bin_dir, script), 0o755)
+    support = os.path.join(root, "Support")
+    os.makedirs(support, exist_ok=True)
+    for mat in materials:
+        open(os.path.join(support, mat + ".cif"), "w").close()
+    for index, ads in enumerate(adsorbates):
+        write_inputs(os.path.join(support, ads))
+        with open(os.path.join(support, ads, "OUTCAR"), "w") as f:
+            f.write(MOLECULE_OUTCAR.format(-10.0 - index))
+    return support
+
+
+def run_benchmark(args):
+    root = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="netchg-bench-"))
+    materials = [f"M{i}" for i in range(args.materials)]
+    adsorbates = [f"A{j}" for j in range(args.adsorbates)]
+    support = setup_project(root, materials, adsorbates)
+    charges = [int(charge) for charge in str(args.charges).split(",")]
+
+    # flow_jobs 在导入时读取这些环境变量
+    os.environ.update({
+        "NETCHG_RESULTS_DB": os.path.join(root, "results.db"),
+        "NETCHG_METRICS_FILE": os.path.join(root, "flow-metrics.jsonl"),
+        "NETCHG_SCHEDULER": "local",
+        "NETCHG_THERMAL_MODE": args.thermal_mode,
+        "NETCHG_LOCAL_COMMAND": f"{sys.executable} {os.path.join(REPO_DIR, 'fake_vasp.py')}",
+        "NETCHG_LOCAL_WORKERS": str(args.workers),
+        "FAKE_VASP_SLEEP": str(args.sleep),
+        "FAKE_VASP_FAIL_RATE": str(args.fail_rate),
+        "FAKE_VASP_NONCONV_RATE": str(args.nonconv_rate),
+        "FAKE_VASP_MAX_FAILURES": str(args.max_failures),
+        "PATH": os.path.join(root, "bin") + os.pathsep + os.environ.get("PATH", ""),
+    })
+    os.chdir(support)
+    sys.path.insert(0, REPO_DIR)
+    import flow_jobs
+
+    if args.rescan and os.path.isfile(flow_jobs.STATE_FILE):
+        # 模拟没有状态记录的重启：所有节点按目录重新扫描
+        os.remove(flow_jobs.STATE_FILE)
+
+    if not args.real_builders:
+        flow_jobs.build_slab = fake_build_slab
+        flow_jobs.build_adsorbate = fake_build_adsorbate
+        flow_jobs.build_adsorbate_charges = fake_build_adsorbate_charges
+        flow_jobs.build_adsorbates = fake_build_adsorbates
+        flow_jobs.build_thermal = fake_build_thermal
+    scheduler = flow_jobs.SCHEDULER
+    scheduler.interval = scheduler.current_interval = args.poll_interval
+    scheduler.max_interval = max(args.poll_interval, args.max_poll_interval)
+
+    sites = str(args.site).split(",")
+    flows = []
+    for mat in materials:
+        if len(sites) > 1:
+            flows.extend(flow_jobs.site_flows(mat, adsorbates, sites, charges))
+        elif len(charges) > 1:
+            flows.extend(flow_jobs.charge_sweep_flows(mat, adsorbates, args.site, charges))
+        else:
+            flows.append(flow_jobs.Flow(mat, adsorbates, args.site, charges[0]))
+
+    fs_counts = {}
+    if args.tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with quiet_stdout(args.quiet), count_fs_operations(fs_counts):
+        graph = flow_jobs.build_graph(flows, max_in_flight=args.max_in_flight, use_job_arrays=args.job_arrays)
+        # 每轮调度的 squeue 次数：一轮中的所有状态查询应共用一次 squeue
+        round_squeue_calls = []
+        step = graph.step
+
+        def counted_step():
+            before = scheduler.squeue_calls
+            remaining = step()
+            round_squeue_calls.append(scheduler.squeue_calls - before)
+            return remaining
+
+        graph.step = counted_step
+        success = graph.run()
+        flow_jobs.RESULTS.export_text()
+    wall = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+
+    nodes = list(graph.nodes.values())
+    stages = graph.metrics.summary() if graph.metrics else {}
+    report = {
+        "materials": args.materials,
+        "adsorbates": args.adsorbates,
+        "charges": charges,
+        "sites": sites,
+        "thermal_mode": args.thermal_mode,
+        "job_arrays": args.job_arrays,
+        "success": success,
+        "wall_s": round(wall, 3),
+        "nodes": len(nodes),
+        "nodes_succeeded": sum(1 for node in nodes if node.status == "success"),
+        "retries": sum(node.retries for node in nodes),
+        "binding_results": len(flow_jobs.RESULTS.query(stage="binding")),
+        "submit_calls": scheduler.submit_calls,
+        "squeue_calls": scheduler.squeue_calls,
+        "rounds": len(round_squeue_calls),
+        "first_round_squeue_calls": round_squeue_calls[0] if round_squeue_calls else 0,
+        "max_round_squeue_calls": max(round_squeue_calls, default=0),
+        "stage_queue_wait_s": {stage: totals["queue_wait_s"] for stage, totals in stages.items()},
+        "stage_run_s": {stage: totals["run_s"] for stage, totals in stages.items()},
+        "fs_operations": dict(sorted(fs_counts.items())),
+        "fs_operations_total": sum(fs_counts.values()),
+        # Linux 上 ru_maxrss 的单位为 KB
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "traced_peak_mb": round(traced_peak / 2 ** 20, 2) if traced_peak is not None else None,
+        "workdir": root,
+    }
+    if not args.keep and not args.workdir:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    # 用法: python bench_flow.py --materials 4 --adsorbates 3 --charges -1 --sleep 0.2 --fail-rate 0.2
+    parser = argparse.ArgumentParser(description="End-to-end flow throughput benchmark with a fake VASP.")
+    parser.add_argument("--materials", type=int, default=2)
+    parser.add_argument("--adsorbates", type=int, default=3)
+    parser.add_argument("--charges", default="-1",
+                        help="net charge, or a comma-separated charge sweep (e.g. --charges -1,0,1)")
+    parser.add_argument("--site", default="0", help="adsorption site, or a comma-separated list of sites")
+    parser.add_argument("--sleep", type=float, default=0.2, help="fake VASP run time per job (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of first attempts that crash")
+    parser.add_argument("--nonconv-rate", type=float, default=0.0, help="fraction of relaxations hitting NSW")
+    parser.add_argument("--max-failures", type=int, default=1, help="failed attempts per directory before success")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent fake VASP processes")
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--max-poll-interval", type=float, default=1.0)
+    parser.add_argument("--no-job-arrays", dest="job_arrays", action="store_false")
+    parser.add_argument("--thermal-mode", choices=("serial", "array"), default="serial",
+                        help="one IBRION = 5 job per adsorbate, or finite-difference single points as a job array")
+    parser.add_argument("--real-builders", action="store_true", help="generate inputs with pymatgen")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the peak of traced allocations")
+    parser.add_argument("--workdir", help="project directory to use (kept after the run)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary project directory")
+    parser.add_argument("--rescan", action="store_true",
+                        help="delete the flow state in --workdir first, so a restart rescans every directory")
+    parser.add_argument("--quiet", action="store_true", help="hide the flow log")
+    parser.add_argument("--json", action="store_true", help="print the report as one JSON line")
+    # argparse 把 "-1,0,1" 这类以 "-" 开头的值当作选项，改写为 --charges=-1,0,1
+    argv = sys.argv[1:]
+    for i, arg in enumerate(argv[:-1]):
+        if arg == "--charges":
+            argv[i:i + 2] = [f"--charges={argv[i + 1]}"]
+            break
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:22s} {value}")
+    exit(0 if report["success"] else 1)
@@ -0,0 +1,92 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# 需要测量启动时间的命令行入口
+ENTRY_POINTS = [
+    "slab.py", "adsorbate-NELECT.py", "far-adsorbate-NELECT.py", "batch-adsorbate.py", "NELECT.py", "thermal.py",
+    "binding.py", "far-binding.py", "flow-binding.py", "screen.py", "outcar.py", "thermo.py", "results.py",
+]
+# 默认阈值：单个入口导入耗时超过该值（毫秒）视为退化
+DEFAULT_MAX_MS = 1000
+# 与基准文件比较时允许的相对增长
+DEFAULT_TOLERANCE = 1.5
+
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(script, python=sys.executable):
+    """
+    在新的解释器中以 -X importtime 载入脚本（不执行 __main__ 部分），返回墙钟时间与最耗时的顶层导入。
+
+    :return: {"script", "wall_ms", "import_ms", "top": [(模块, 毫秒), ...]}
+    """
+    code = f"import runpy; runpy.run_path({script!r}, run_name='__bench__')"
+    start = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} failed to import:\n{result.stderr.strip().splitlines()[-1]}")
+    top = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        # 缩进为 1 个空格的是顶层导入，其累计时间已包含子模块
+        if match and len(match.group(3)) == 1:
+            top.append((match.group(4), int(match.group(2)) / 1000))
+    top.sort(key=lambda item: item[1], reverse=True)
+    return {"script": script, "wall_ms": round(wall_ms, 1), "import_ms": round(sum(ms for _, ms in top), 1),
+            "top": [(name, round(ms, 1)) for name, ms in top[:5]]}
+
+
+def check(results, max_ms=DEFAULT_MAX_MS, baseline=None, tolerance=DEFAULT_TOLERANCE):
+    """
+    返回退化的入口列表：导入耗时超过 max_ms，或超过基准值的 tolerance 倍。
+    """
+    regressions = []
+    for result in results:
+        limit = max_ms
+        if baseline and result["script"] in baseline:
+            limit = min(limit, baseline[result["script"]] * tolerance)
+        if result["import_ms"] > limit:
+            regressions.append((result["script"], result["import_ms"], round(limit, 1)))
+    return regressions
+
+
+if __name__ == "__main__":
+    # 用法: python bench_startup.py [scripts...] [--max-ms 1000] [--baseline startup.json] [--save startup.json]
+    parser = argparse.ArgumentParser(description="Measure cold import time of each CLI entry point.")
+    parser.add_argument("scripts", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_MAX_MS, help="absolute import-time limit (ms)")
+    parser.add_argument("--baseline", help="JSON file of {script: import_ms} to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed growth over baseline")
+    parser.add_argument("--save", help="write the measured import times as a new baseline")
+    args = parser.parse_args()
+
+    results = []
+    for script in args.scripts:
+        try:
+            result = measure(script)
+        except RuntimeError as e:
+            print(f"{script:28s} ERROR: {e}", file=sys.stderr)
+            continue
+        results.append(result)
+        heaviest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in result["top"][:3])
+        print(f"{script:28s} wall {result['wall_ms']:8.1f} ms  import {result['import_ms']:8.1f} ms  [{heaviest}]")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({result["script"]: result["import_ms"] for result in results}, f, indent=2, sort_keys=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = check(results, args.max_ms, baseline, args.tolerance)
+    for script, import_ms, limit in regressions:
+        print(f"Regression: {script} imports in {import_ms} ms (limit {limit} ms)", file=sys.stderr)
+    exit(1 if regressions or len(results) != len(args.scripts) else 0)
@@ -1,70 +1,86 @@
 import os
-import subprocess
-import time
-import datetime
 import sys
-import glob
-import re
-import pandas as pd
-import csv
-from contextlib import contextmanager
 
-
-@contextmanager
-def change_directory(destination):
-    original_dir = os.getcwd()
-    try:
-        os.chdir(destination)
-        yield
-    finally:
-        os.chdir(original_dir)
+from outcar import final_energy
+from results import ResultStore
 
 
 # Binding Energy: Eads = Eadsorbate - Esurface - Emolecule
-# Usage: python binding.py sys.argv[1] sys.argv[2]
-
-support_name = sys.argv[1]     # 催化剂名称，例如 Fe, FePc, Fe2O3, Fe-MOF 等催化剂
-adsorbate_name = sys.argv[2]   # 吸附物名称，例如 OOH, OH, CO2, N2, SO4, benzene 等吸附物
-
-molecule_dir = os.path.join("..", "Support", adsorbate_name)
-support_dir = os.path.join("..", "Support", support_name)
-adsorbate_dir = os.path.join("..", adsorbate_name, support_name)
-
-# getE
-getE_command = "grep '  without' OUTCAR | tail -n 1 | awk '{print $7}'"
-
-with change_directory(molecule_dir):
-   Emolecule = float(subprocess.check_output(getE_command, shell=True, text=True).strip())
-
-with change_directory(support_dir):
-   Esupport = float(subprocess.check_output(getE_command, shell=True, text=True).strip())
-
-with change_directory(adsorbate_dir):
-   Eadsorbate = float(subprocess.check_output(getE_command, shell=True, text=True).strip())
-
-Eads = Eadsorbate - Esupport - Emolecule
-
-
-# Save
-output_file = "Eads.csv"
-
-file_exists = os.path.exists(output_file) and os.path.getsize(output_file) > 0
-
-with open(output_file, mode="a", newline="") as file:
-    writer = csv.writer(file)
-
-    if not file_exists:
-        writer.writerow(["adsorbate_name", "support_name", "Emolecule", "Esupport", "Eadsorbate", "Eads"])
-
-    writer.writerow([
-        adsorbate_name,
-        support_name,
-        f"{Emolecule:.2f}",
-        f"{Esupport:.2f}",
-        f"{Eadsorbate:.2f}",
-        f"{Eads:.2f}"
-    ])
-
-print(f"Binding Energy 已保存到 {output_file}")
-
-
+# Usage: python binding.py sys.argv[1] sys.argv[2] [calc_name] [site_index] [net_charge]
+#        far-binding.py 另接受 [num_top_layers]（与生成 far 参考时相同，默认 slab.NUM_TOP_LAYERS）
+
+OUTPUT_FILE = "Eads.csv"
+
+
+def compute_binding(support_name, adsorbate_name, calc_name=None, site_index="", net_charge=0, store=None):
+    """
+    Eads = Eadsorbate - Esupport - Emolecule，写入结果库（同一主键重复计算时覆盖旧值）。
+    Eads.csv 由 store.export_text() 统一重新生成。
+
+    :param store: 结果库，默认打开 RESULTS_DB
+    :return: Eads
+    """
+    calc_name = calc_name or support_name
+    molecule_dir = os.path.join("..", "Support", adsorbate_name)
+    support_dir = os.path.join("..", "Support", support_name)
+    adsorbate_dir = os.path.join("..", adsorbate_name, calc_name)
+
+    # getE：倒序读取 OUTCAR 末尾的 energy(sigma->0)
+    Emolecule = final_energy(os.path.join(molecule_dir, "OUTCAR"))
+    Esupport = final_energy(os.path.join(support_dir, "OUTCAR"))
+    Eadsorbate = final_energy(os.path.join(adsorbate_dir, "OUTCAR"))
+
+    Eads = Eadsorbate - Esupport - Emolecule
+    _save(store, support_name, adsorbate_name, site_index, net_charge, calc_name, Eads,
+          {"Emolecule": Emolecule, "Esupport": Esupport, "Eadsorbate": Eadsorbate})
+    return Eads
+
+
+def compute_far_binding(support_name, adsorbate_name, calc_name=None, site_index="", net_charge=0, store=None,
+                        far_dir=None, num_top_layers=None):
+    """
+    净电荷不为0时：Eads = Eadsorbate - Efar_adsorbate。
+    far 参考与位点无关，按 (材料, 吸附物, 电荷, 计算设置) 查找，见 adsorbate.far_reference_dir。
+
+    :param far_dir: far 参考目录，None 时按上述规则查找
+    :param num_top_layers: 生成 far 参考时的表面层数（计算设置的一部分），None 时为 slab.NUM_TOP_LAYERS
+    :return: Eads
+    """
+    calc_name = calc_name or support_name
+    adsorbate_dir = os.path.join("..", adsorbate_name, calc_name)
+    if far_dir is None:
+        from adsorbate import far_reference_dir, NUM_TOP_LAYERS
+        far_dir = far_reference_dir(support_name, adsorbate_name, net_charge, calc_name,
+                                    NUM_TOP_LAYERS if num_top_layers is None else num_top_layers)
+
+    Eadsorbate = final_energy(os.path.join(adsorbate_dir, "OUTCAR"))
+    Efar_adsorbate = final_energy(os.path.join(far_dir, "OUTCAR"))
+
+    Eads = Eadsorbate - Efar_adsorbate
+    _save(store, support_name, adsorbate_name, site_index, net_charge, calc_name, Eads,
+          {"Eadsorbate": Eadsorbate, "Efar_adsorbate": Efar_adsorbate, "far_reference": os.path.basename(far_dir)})
+    return Eads
+
+
+def _save(store, support_name, adsorbate_name, site_index, net_charge, calc_name, Eads, metadata):
+    store = store or ResultStore()
+    store.upsert(support_name, "binding", adsorbate_name, site_index, net_charge, name=calc_name, eads=Eads,
+                 metadata=metadata)
+
+
+def main(argv, compute=compute_binding):
+    support_name = argv[1]     # 催化剂名称，例如 Fe, FePc, Fe2O3, Fe-MOF 等催化剂
+    adsorbate_name = argv[2]   # 吸附物名称，例如 OOH, OH, CO2, N2, SO4, benzene 等吸附物
+    calc_name = argv[3] if len(argv) > 3 else support_name  # 吸附计算目录名
+    site_index = argv[4] if len(argv) > 4 else ""           # 吸附位点（结果库主键的一部分）
+    net_charge = int(argv[5]) if len(argv) > 5 else 0        # 净电荷
+    # 表面层数（仅 far-binding.py）：far 参考目录名中的设置摘要包含该值
+    options = {"num_top_layers": int(argv[6])} if len(argv) > 6 else {}
+    store = ResultStore()
+    compute(support_name, adsorbate_name, calc_name, site_index, net_charge, store, **options)
+    store.export_text()
+    print(f"Binding Energy 已保存到 {store.path} 与 {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
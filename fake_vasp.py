@@ -0,0 +1,136 @@
+import os
+import re
+import sys
+import glob
+import time
+import zlib
+
+# 模拟 VASP：在当前计算目录中等待一段时间后写出 OUTCAR / OSZICAR / CONTCAR，用于在没有集群时测试流程。
+# 行为由环境变量控制：
+#   FAKE_VASP_SLEEP          每个作业的运行时间（秒），默认 0.5
+#   FAKE_VASP_FAIL_RATE      作业中途崩溃（OUTCAR 没有 Total CPU time）的比例，默认 0
+#   FAKE_VASP_NONCONV_RATE   结构优化达到 NSW 仍未收敛（没有 reached required accuracy）的比例，默认 0
+#   FAKE_VASP_MAX_FAILURES   同一目录最多失败的次数，之后的重算总是成功，默认 1
+#   FAKE_VASP_SEED           随机种子；同一目录、同一次重算的结果是确定的
+#   FAKE_VASP_FORCE_CONSTANT 单点计算（NSW = 0）的简谐力常数（eV/Å^2），受力为 -k (x - x0)，x0 取自上级目录的 POSCAR
+SLEEP = float(os.environ.get("FAKE_VASP_SLEEP", 0.5))
+FAIL_RATE = float(os.environ.get("FAKE_VASP_FAIL_RATE", 0))
+NONCONV_RATE = float(os.environ.get("FAKE_VASP_NONCONV_RATE", 0))
+MAX_FAILURES = int(os.environ.get("FAKE_VASP_MAX_FAILURES", 1))
+SEED = os.environ.get("FAKE_VASP_SEED", "0")
+FORCE_CONSTANT = float(os.environ.get("FAKE_VASP_FORCE_CONSTANT", 5.0))
+
+# 每个离子步约 1 KB 的电子步输出，使 OUTCAR 的大小与读取方式接近真实情况
+SCF_LINES = 12
+# 模拟的振动频率（cm-1），末尾一个为虚频
+FREQUENCIES = [3650.2, 1620.4, 780.3, 455.1, 310.8, 120.6, 45.2]
+
+
+def uniform(*keys):
+    """
+    由目录与重算次数得到 [0, 1) 之间的确定性伪随机数。
+    """
+    return zlib.crc32("|".join(str(key) for key in (SEED,) + keys).encode()) / 2 ** 32
+
+
+def read_incar():
+    incar = {}
+    if os.path.isfile("INCAR"):
+        with open("INCAR") as f:
+            for line in f:
+                match = re.match(r"\s*(\w+)\s*=\s*([^!#\n]*)", line)
+                if match:
+                    incar[match.group(1).upper()] = match.group(2).strip()
+    return incar
+
+
+def ionic_step(step, energy, ionic_steps):
+    lines = [f"--------------------------------------- Iteration {step:6d}({SCF_LINES:4d})  "
+             f"---------------------------------------\n"]
+    lines += [f"  DAV: {scf:3d}   {energy + 1.0 / scf:.8E}   {-1.0 / scf ** 2:.5E}\n"
+              for scf in range(1, SCF_LINES + 1)]
+    step_energy = energy + 0.05 * (ionic_steps - step) / ionic_steps
+    lines.append("  FREE ENERGIE OF THE ION-ELECTRON SYSTEM (eV)\n")
+    lines.append(f"  free  energy   TOTEN  =     {step_energy:.8f} eV\n")
+    lines.append(f"  energy  without entropy=     {step_energy:.8f}  energy(sigma->0) =     {step_energy:.8f}\n")
+    return "".join(lines), step_energy
+
+
+def force_block():
+    """
+    有限差分位移单点（见 vibrations.py）的受力：相对上级目录 POSCAR 中平衡位置的简谐恢复力。
+    """
+    from vibrations import read_poscar
+
+    positions = read_poscar("POSCAR")["positions"]
+    reference = read_poscar(os.path.join("..", "POSCAR"))["positions"] if os.path.isfile("../POSCAR") else positions
+    forces = -FORCE_CONSTANT * (positions - reference)
+    lines = [" POSITION                                       TOTAL-FORCE (eV/Angst)\n",
+             " " + "-" * 83 + "\n"]
+    lines += [f" {x:12.5f} {y:12.5f} {z:12.5f}   {fx:14.6f} {fy:14.6f} {fz:14.6f}\n"
+              for (x, y, z), (fx, fy, fz) in zip(positions, forces)]
+    lines.append(" " + "-" * 83 + "\n")
+    return "".join(lines)
+
+
+def write_outputs(directory, thermal, outcome, energy):
+    nsw = int(re.sub(r"\D", "", read_incar().get("NSW", "400")) or 400)
+    single_point = nsw == 0
+    ionic_steps = 1 if thermal or single_point else min(nsw, 8 if outcome == "ok" else nsw)
+    if outcome == "crash":
+        ionic_steps = max(1, ionic_steps // 2)
+    start = time.time()
+    outcar = [" vasp.6.3.0 (fake) \n", f" executed in {directory}\n"]
+    oszicar = []
+    for step in range(1, ionic_steps + 1):
+        text, step_energy = ionic_step(step, energy, ionic_steps)
+        outcar.append(text)
+        oszicar.append(f"{step:4d} F= {step_energy:.8E} E0= {step_energy:.8E}  d E ={-0.01 / step:.6E}\n")
+    if thermal and outcome != "crash":
+        outcar.append(" Eigenvectors and eigenvalues of the dynamical matrix\n")
+        outcar.append(" ----------------------------------------------------\n")
+        for index, frequency in enumerate(FREQUENCIES, 1):
+            label = "f/i=" if index == len(FREQUENCIES) else "f  ="
+            outcar.append(f"  {index:3d} {label} {frequency * 0.0299792458:12.6f} THz "
+                          f"{frequency * 0.188365157:12.6f} 2PiTHz {frequency:12.6f} cm-1 "
+                          f"{frequency * 0.1239841984:12.6f} meV\n")
+    if single_point and outcome != "crash" and os.path.isfile("POSCAR"):
+        outcar.append(force_block())
+    if outcome == "ok" and not (thermal or single_point):
+        outcar.append(" reached required accuracy - stopping structural energy minimisation\n")
+    if outcome != "crash":
+        elapsed = time.time() - start + SLEEP
+        outcar.append(f"                  Total CPU time used (sec):     {elapsed:10.3f}\n")
+        outcar.append(f"                            Elapsed time (sec):     {elapsed:10.3f}\n")
+    with open("OUTCAR", "w") as f:
+        f.writelines(outcar)
+    with open("OSZICAR", "w") as f:
+        f.writelines(oszicar)
+    if os.path.isfile("POSCAR") and outcome != "crash":
+        with open("POSCAR") as src, open("CONTCAR", "w") as dst:
+            dst.write(src.read())
+
+
+def main():
+    directory = os.getcwd()
+    thermal = re.sub(r"\D", "", read_incar().get("IBRION", "2")) == "5"
+    # backup.sh 每次重算前会把 OUTCAR 备份为 OUTCAR-oldN
+    attempt = len(glob.glob("OUTCAR-old*"))
+    draw = uniform(directory, attempt)
+    if attempt >= MAX_FAILURES:
+        outcome = "ok"
+    elif draw < FAIL_RATE:
+        outcome = "crash"
+    elif draw < FAIL_RATE + NONCONV_RATE and not thermal:
+        outcome = "nonconverged"
+    else:
+        outcome = "ok"
+    energy = -100.0 - 50.0 * uniform(directory)
+    time.sleep(SLEEP)
+    write_outputs(directory, thermal, outcome, energy)
+    print(f"fake VASP finished in {directory}: {outcome}")
+    return 1 if outcome == "crash" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import datetime
+import sys
+
+# 节点状态与 flow-binding.py 中的 TASK_STATUS 保持一致
+NOT_EXECUTED = "not_executed"
+IN_PROGRESS = "in_progress"
+SUCCESS = "success"
+FAILED = "failed"
+RETRY = "retry"
+MAX_RETRY_REACHED = "max_retry_reached"
+
+TERMINAL = (SUCCESS, FAILED, MAX_RETRY_REACHED)
+# 允许的状态转换：RETRY 表示已重新提交、作业尚未结束；终止状态不再改变
+TRANSITIONS = {
+    NOT_EXECUTED: (IN_PROGRESS, RETRY, SUCCESS, FAILED, MAX_RETRY_REACHED),
+    IN_PROGRESS: (IN_PROGRESS, RETRY, SUCCESS, FAILED, MAX_RETRY_REACHED),
+    RETRY: (RETRY, SUCCESS, FAILED, MAX_RETRY_REACHED),
+    SUCCESS: (),
+    FAILED: (),
+    MAX_RETRY_REACHED: (),
+}
+
+
+def log_info(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] INFO: {message}")
+
+
+def log_error(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ERROR: {message}", file=sys.stderr)
+
+
+class Node:
+    """
+    依赖图中的一个计算节点，例如 (材料, 吸附物, 阶段)。
+
+    :param key: 节点标识，如 ("Fe", "OH", "ads")
+    :param submit: 准备输入并提交作业，返回作业 ID；无需作业（已完成或本地步骤）时返回 None
+    :param check: 作业结束后检查结果，参数 allow_retry 为 False 时不得重新提交；返回 (状态, 作业 ID)，
+        重新提交时状态为 RETRY 并给出新的作业 ID，需要重新提交但不允许时状态为 MAX_RETRY_REACHED
+    :param deps: 依赖节点的 key 列表，全部 SUCCESS 后本节点才会提交
+    :param on_success: 节点成功后的收尾操作（如提取能量）
+    :param max_retries: 允许的最多重新提交次数
+    :param directory: 节点的计算目录，用于读取 OUTCAR 中的运行时间等信息；本地步骤为 None
+    """
+
+    def __init__(self, key, submit, check, deps=(), on_success=None, max_retries=2, directory=None):
+        self.key = key
+        self.submit = submit
+        self.check = check
+        self.deps = list(deps)
+        self.on_success = on_success
+        self.max_retries = max_retries
+        self.directory = directory
+        self.status = NOT_EXECUTED
+        self.job_id = None
+        self.retries = 0
+
+    def __repr__(self):
+        return f"Node({'/'.join(str(k) for k in self.key)}, {self.status})"
+
+
+class FlowGraph:
+    """
+    事件驱动的依赖图调度器：每个节点在其依赖全部成功后立即提交，
+    不再等待同一阶段的其他节点，从而避免单个慢任务阻塞整批计算。
+
+    :param poller: 作业状态查询对象，需提供 track(job_id)、is_active(job_id)、tasks(job_id)、hold() 与 sleep()，
+        如 slurm_poller.SlurmPoller
+    :param max_in_flight: 同时在队列中的任务数上限（整个 job array 按其任务数计），None 表示不限制；
+        只在启动新节点前检查，一个节点提交的 job array 可能使总数略超上限；重新提交不受此限制
+    :param batcher: 批量提交器，如 job_array.ArrayBatcher；每轮调度中的提交在本轮结束时统一提交，
+        节点在此之前持有占位作业号
+    :param metrics: 分阶段计时记录，如 flow_metrics.FlowMetrics；每轮调度结束时更新
+    :param state: 节点状态的持久化记录，如 flow_state.FlowState；重试次数跨重启累计，超出重试次数的节点被隔离
+    :param retry_budget: 整个依赖图在本次运行中允许的重新提交总数，None 表示只受各节点的 max_retries 限制
+    """
+
+    def __init__(self, poller, max_in_flight=None, batcher=None, metrics=None, state=None, retry_budget=None):
+        self.poller = poller
+        self.max_in_flight = max_in_flight
+        self.batcher = batcher
+        self.metrics = metrics
+        self.state = state
+        self.retry_budget = retry_budget
+        self.retries_used = 0
+        self.nodes = {}
+
+    def add(self, node):
+        # 相同 key 的节点只保留一个，方便多个下游共享同一个上游
+        if node.key in self.nodes:
+            return self.nodes[node.key]
+        self.nodes[node.key] = node
+        return node
+
+    def _deps_status(self, node):
+        statuses = [self.nodes[dep].status for dep in node.deps if dep in self.nodes]
+        if any(s in (FAILED, MAX_RETRY_REACHED) for s in statuses):
+            return FAILED
+        if all(s == SUCCESS for s in statuses):
+            return SUCCESS
+        return IN_PROGRESS
+
+    def dependencies_met(self, node):
+        return self._deps_status(node) == SUCCESS
+
+    def is_placeholder(self, job_id):
+        return bool(self.batcher) and self.batcher.is_placeholder(job_id)
+
+    def _set_status(self, node, status, job_id=None):
+        if status not in TRANSITIONS[node.status]:
+            log_error(f"Ignoring invalid transition of {node} to {status}.")
+            return
+        node.status = status
+        node.job_id = job_id
+        if self.state:
+            self.state.update(node)
+
+    def _quarantine(self, node, reason):
+        log_error(f"{node} is quarantined: {reason}.")
+        self._set_status(node, MAX_RETRY_REACHED)
+        if self.state:
+            self.state.add_quarantine(node, reason)
+
+    def _retry_allowed(self, node):
+        if node.retries >= node.max_retries:
+            return False
+        return self.retry_budget is None or self.retries_used < self.retry_budget
+
+    def _finish(self, node):
+        if node.on_success:
+            try:
+                node.on_success()
+            except Exception as e:
+                log_error(f"Post-processing failed for {node}: {e}")
+                self._set_status(node, FAILED)
+                return
+        self._set_status(node, SUCCESS)
+        log_info(f"{node} finished.")
+
+    def _check(self, node):
+        # 重试预算在重新提交之前判断，不再为注定失败的节点提交作业
+        allow_retry = self._retry_allowed(node)
+        try:
+            status, job_id = node.check(allow_retry)
+        except Exception as e:
+            log_error(f"Check failed for {node}: {e}")
+            status, job_id = FAILED, None
+        if status == SUCCESS:
+            self._finish(node)
+        elif job_id and status == IN_PROGRESS:
+            self._set_status(node, node.status if node.status == RETRY else IN_PROGRESS, job_id)
+        elif job_id:
+            node.retries += 1
+            self.retries_used += 1
+            self._set_status(node, RETRY, job_id)
+        elif status == MAX_RETRY_REACHED:
+            budget = f"its {node.max_retries} retries" if node.retries >= node.max_retries else \
+                f"the flow's retry budget of {self.retry_budget}"
+            self._quarantine(node, f"still failing after using up {budget}")
+        else:
+            self._set_status(node, FAILED)
+            log_error(f"{node} failed.")
+
+    def _start(self, node):
+        try:
+            job_id = node.submit()
+        except Exception as e:
+            log_error(f"Submission failed for {node}: {e}")
+            self._set_status(node, FAILED)
+            return
+        if job_id:
+            self._set_status(node, IN_PROGRESS, job_id)
+        else:
+            # 已有结果或为本地步骤，直接检查
+            self._check(node)
+
+    def _resolve(self, job_ids):
+        # 将占位作业号替换为批量提交后的真实作业号
+        for node in self.nodes.values():
+            if not self.batcher.is_placeholder(node.job_id):
+                continue
+            if node.job_id in job_ids:
+                self._set_status(node, node.status, job_ids[node.job_id])
+            else:
+                log_error(f"Submission failed for {node}.")
+                self._set_status(node, FAILED)
+
+    def step(self):
+        """
+        执行一次调度：检查已结束的作业，并提交所有已就绪的节点。
+
+        :return: 仍在运行或等待的节点数
+        """
+        if self.batcher:
+            self.batcher.begin()
+        # 本轮的所有状态查询（含重新扫描目录时的 running_job）共用一次批量查询
+        with self.poller.hold():
+            running = [node for node in self.nodes.values() if node.job_id]
+            # 先登记全部作业，保证本轮只触发一次批量查询
+            for node in running:
+                self.poller.track(node.job_id)
+            for node in running:
+                if not self.poller.is_active(node.job_id):
+                    log_info(f"Job {node.job_id} for {node} has left the queue.")
+                    self._check(node)
+            in_flight = sum(self.poller.tasks(node.job_id) for node in self.nodes.values() if node.job_id)
+            progressed = True
+            while progressed:
+                progressed = False
+                for node in self.nodes.values():
+                    if node.status != NOT_EXECUTED:
+                        continue
+                    deps = self._deps_status(node)
+                    if deps == FAILED:
+                        log_error(f"Skipping {node}: an upstream node failed.")
+                        self._set_status(node, FAILED)
+                        progressed = True
+                    elif deps == SUCCESS:
+                        if self.max_in_flight is not None and in_flight >= self.max_in_flight:
+                            continue
+                        self._start(node)
+                        if node.job_id:
+                            in_flight += self.poller.tasks(node.job_id)
+                        progressed = True
+            if self.batcher:
+                self._resolve(self.batcher.flush())
+        if self.metrics:
+            self.metrics.update(self)
+        if self.state:
+            self.state.save()
+        return sum(1 for node in self.nodes.values() if node.status not in TERMINAL)
+
+    def run(self):
+        if self.metrics:
+            self.metrics.attach(self)
+        if self.state:
+            for node in self.nodes.values():
+                self.state.restore(node)
+        while self.step():
+            self.poller.sleep()
+        failed = [node for node in self.nodes.values() if node.status != SUCCESS]
+        for node in failed:
+            log_error(f"{node} did not complete.")
+        if self.metrics:
+            self.metrics.finish(not failed)
+        return not failed
@@ -0,0 +1,739 @@
+import os
+import subprocess
+import datetime
+import sys
+import glob
+import shutil
+from contextlib import contextmanager
+
+from adsorbate import build_adsorbate, build_adsorbate_charges, build_adsorbates, far_reference_dir
+from binding import compute_binding, compute_far_binding
+from flow_dag import Node, FlowGraph
+from flow_metrics import FlowMetrics
+from flow_state import FlowState
+from job_array import ArrayBatcher, JobArray
+from outcar_cache import OutcarCache
+from restart import apply_restart
+from results import ResultStore
+from slab import build_slab
+from sites import site_labels
+from scheduler import make_scheduler, scheduler_options_from_env
+from thermal import build_thermal
+import thermo
+import vibrations
+
+# 定义任务状态枚举
+TASK_STATUS = {
+    "NOT_EXIST": "not_exist",
+    "NOT_EXECUTED": "not_executed",
+    "IN_PROGRESS": "in_progress",
+    "COMPLETED": "completed",
+    "SUCCESS": "success",
+    "FAILED": "failed",
+    "RETRY": "retry",
+    "MAX_RETRY_REACHED": "max_retry_reached"
+}
+
+# 外部脚本文件名变量定义
+BACKUP_SCRIPT = "backup.sh"
+RELAX2_SCRIPT = "gam-subvasp.sh"
+R2T_SCRIPT = "r2t.sh"
+# 重新提交前按中止原因（时间上限、NSW 用完、SCF 不收敛、ZBRENT）修改 INCAR，见 restart.py
+USE_RESTART_POLICY = True
+
+TOP_LAYER = '3'  # 默认放开 top layer 数量
+GCORR_TEMPERATURE = thermo.DEFAULT_TEMPERATURE  # Gcorr 计算温度（K），缓存中的 Gcorr 对应该温度
+
+# squeue 轮询参数：初始间隔、最大间隔（秒）与无状态变化时的退避倍数
+POLL_INTERVAL = 60
+POLL_MAX_INTERVAL = 600
+POLL_BACKOFF = 1.5
+# 所有提交、等待与状态检查共享同一个调度后端（默认 SLURM，批量 squeue 轮询）；
+# 设置 NETCHG_SCHEDULER=local 与 NETCHG_LOCAL_COMMAND 时在本机进程池中运行给定命令
+SCHEDULER = make_scheduler(scheduler_options_from_env(
+    {"submit_script": RELAX2_SCRIPT, "interval": POLL_INTERVAL, "max_interval": POLL_MAX_INTERVAL, "backoff": POLL_BACKOFF}))
+# 所有流程的能量、Gcorr 与结合能写入同一个结果库
+RESULTS = ResultStore()
+# OUTCAR 未变化时直接使用缓存的解析结果，流程重启时无需重新扫描
+OUTCAR_CACHE = OutcarCache()
+# 同一轮调度中同一阶段的提交打包为一个 job array；失败的任务按下标重新提交
+USE_JOB_ARRAYS = True
+ARRAYS = ArrayBatcher(SCHEDULER)
+# 每个节点的排队、运行、依赖等待时间与重试次数以 JSON lines 追加到 METRICS_FILE（设为空字符串时不记录）；
+# 设置 NETCHG_PROMETHEUS_FILE 时在流程结束后写出 Prometheus textfile
+METRICS_FILE = os.environ.get("NETCHG_METRICS_FILE", "flow-metrics.jsonl")
+PROMETHEUS_FILE = os.environ.get("NETCHG_PROMETHEUS_FILE")
+# 各阶段每个节点允许的重新提交次数（跨重启累计，记录在 STATE_FILE 中），用完后节点被隔离，不再提交；
+# MAX_TOTAL_RETRIES 限制整个流程一次运行中的重新提交总数，None 表示不限制
+RETRY_BUDGETS = {"slab": 2, "ads": 2, "far": 2, "thermal": 2}
+MAX_TOTAL_RETRIES = None
+STATE_FILE = os.environ.get("NETCHG_STATE_FILE", "flow-state.json")
+# 重启时已成功的节点直接取自 STATE_FILE；设置 NETCHG_VERIFY_STATE=1 时先核对其 OUTCAR 校验值
+VERIFY_STATE = os.environ.get("NETCHG_VERIFY_STATE", "0") == "1"
+# 频率计算方式：serial 为 r2t.sh 生成的一个 IBRION = 5 作业；array 为有限差分的位移单点以 job array 并行运行，
+# 再组装 Hessian（见 vibrations.py）
+THERMAL_MODE = os.environ.get("NETCHG_THERMAL_MODE", "serial")
+
+
+# 日志函数
+def log_info(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] INFO: {message}")
+
+
+def log_error(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ERROR: {message}", file=sys.stderr)
+
+
+# 单个流程中的错误只终止该节点，不影响同一进程中的其他流程
+class FlowError(RuntimeError):
+    pass
+
+
+# 在当前进程中生成输入文件（pymatgen 只导入一次），任何异常都转换为 FlowError
+def run_builder(builder, *args, **kwargs):
+    try:
+        return builder(*args, **kwargs)
+    except Exception as e:
+        raise FlowError(f"Error: {builder.__name__} failed for {args}. Details: {e}") from e
+
+
+@contextmanager
+def change_directory(destination):
+    original_dir = os.getcwd()
+    try:
+        os.chdir(destination)
+        yield
+    finally:
+        os.chdir(original_dir)
+
+
+# 切换调度后端（如测试时使用 scheduler.LocalScheduler）
+def use_scheduler(scheduler):
+    global SCHEDULER
+    SCHEDULER = scheduler
+    ARRAYS.scheduler = scheduler
+    return scheduler
+
+
+# 检查目录最近一次提交的作业是否仍在队列中（identifier 为相对于当前目录的计算目录）
+def check_slurm_job_running(identifier):
+    job_id = SCHEDULER.running_job(identifier)
+    return job_id is not None, job_id
+
+
+# 提交任务；依赖图调度过程中由 ARRAYS 收集，本轮结束时与同阶段的其他目录一起以 job array 提交
+def submit_job(identifier, stage="relax"):
+    if ARRAYS.active:
+        job_id = ARRAYS.request(identifier, stage)
+        log_info(f"Queued {identifier} for {stage} job array submission.")
+        return job_id
+    try:
+        job_id = SCHEDULER.submit(identifier)
+        if job_id:
+            log_info(f"Submitted job {job_id} for {identifier}.")
+        return job_id
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise FlowError(f"Error: Failed to submit job for {identifier}. Details: {e}")
+
+
+# 备份并重新提交任务
+def backup_and_resubmit(identifier):
+    try:
+        result = subprocess.call([BACKUP_SCRIPT, identifier])
+        if result != 0:
+            log_error(f"Backup failed for {identifier}. Exit code: {result}")
+            return
+    except Exception as e:
+        log_error(f"Error executing backup script for {identifier}: {e}")
+        return
+    log_info(f"Backup for {identifier} completed. Resubmitting the job.")
+    if USE_RESTART_POLICY:
+        try:
+            diagnosis, settings = apply_restart(identifier)
+            changes = ", ".join(f"{key} = {value}" for key, value in settings.items()) or "none"
+            log_info(f"{identifier} stopped: {diagnosis.reason} ({diagnosis.detail}). INCAR changes: {changes}")
+        except (OSError, ValueError) as e:
+            log_error(f"Restart policy failed for {identifier}, resubmitting unchanged: {e}")
+    job_id = submit_job(identifier, "retry")
+    if job_id:
+        log_info(f"Job submitted successfully with ID: {job_id}")
+    else:
+        log_error(f"Job submission failed for {identifier}.")
+    return job_id
+
+
+# 等待任务完成
+def wait_for_job_completion(job_id):
+    log_info(f"Waiting for job {job_id} to complete...")
+    SCHEDULER.wait([job_id])
+    log_info(f"Job {job_id} has completed.")
+
+
+# 读取 {identifier}/OUTCAR 末尾的信息，文件不存在时返回 None
+def outcar_summary(identifier):
+    outcar_file = os.path.join(identifier, "OUTCAR")
+    if not os.path.isfile(outcar_file):
+        return None
+    return OUTCAR_CACHE.summary(outcar_file)
+
+
+# 代替 rcheck.sh：结构优化收敛时将 CONTCAR 复制为 1-contcar/CONTCAR-{identifier}
+def relax_converged(identifier):
+    os.makedirs("1-contcar", exist_ok=True)
+    summary = outcar_summary(identifier)
+    if not (summary and summary.required_accuracy and summary.total_cpu_time):
+        log_info(f"Error: pattern not found in OUTCAR for {identifier}")
+        return False
+    contcar = os.path.join(identifier, "CONTCAR")
+    target = os.path.join("1-contcar", f"CONTCAR-{identifier}")
+    # 重启时 CONTCAR 未变化则不再复制
+    if not os.path.isfile(target) or os.path.getmtime(target) < os.path.getmtime(contcar):
+        shutil.copy(contcar, target)
+    return True
+
+
+# 代替 getE.sh：将 {identifier}/OUTCAR 的最终能量写入结果库
+def record_energy(identifier, material, stage, adsorbate="", site="", charge=0):
+    summary = outcar_summary(identifier)
+    if not summary or summary.energy is None:
+        raise FlowError(f"No energy found in {identifier}/OUTCAR")
+    RESULTS.upsert(material, stage, adsorbate, site, charge, name=identifier, energy=summary.energy,
+                   metadata={"outcar": os.path.abspath(os.path.join(identifier, "OUTCAR")),
+                             "ionic_steps": summary.ionic_steps})
+
+
+# 代替 getG.sh：由 thermal OUTCAR 的振动频率计算 Gcorr 并写入结果库；OUTCAR 未变化时直接使用缓存
+def record_gcorr(identifier, material, adsorbate, site, charge):
+    outcar_file = os.path.join(identifier, "OUTCAR")
+    value = OUTCAR_CACHE.gcorr(outcar_file, lambda: thermo.gcorr(outcar_file, GCORR_TEMPERATURE))
+    RESULTS.upsert(material, "thermal", adsorbate, site, charge, name=identifier, gcorr=value,
+                   metadata={"temperature": GCORR_TEMPERATURE})
+
+
+# 有限差分频率的 Gcorr：频率取自位移单点组装的 vibrations.json
+def record_vibrations(identifier, material, adsorbate, site, charge):
+    value = vibrations.gcorr(identifier, GCORR_TEMPERATURE)
+    _, imaginary = vibrations.read_vibrations(identifier)
+    RESULTS.upsert(material, "thermal", adsorbate, site, charge, name=identifier, gcorr=value,
+                   metadata={"temperature": GCORR_TEMPERATURE, "mode": "array", "imaginary_cm": imaginary})
+
+
+# 以 job array 提交位移单点计算（全部或给定下标），返回 job array 的作业号
+def submit_displacements(identifier, indices=None):
+    directories = vibrations.displacement_dirs(identifier)
+    array = JobArray(os.path.join(identifier, vibrations.LIST_FILE), directories, SCHEDULER)
+    task_ids = array.submit(indices)
+    if not task_ids:
+        return None
+    return next(iter(task_ids.values())).split('_')[0]
+
+
+# 检查位移单点计算：全部完成时组装 Hessian；有任务仍在队列中时返回其 job array 作业号；
+# 其余未完成的任务按下标重新提交，allow_retry 为 False 时返回 MAX_RETRY_REACHED
+def check_displacements_and_retry(identifier, allow_retry=True):
+    try:
+        directories = vibrations.displacement_dirs(identifier)
+    except (OSError, ValueError) as e:
+        log_error(f"No displacement scheme for {identifier}: {e}")
+        return TASK_STATUS["FAILED"], None
+    unfinished = []
+    for index, directory in enumerate(directories):
+        summary = outcar_summary(directory)
+        if not (summary and summary.total_cpu_time):
+            unfinished.append(index)
+    if not unfinished:
+        try:
+            real, imaginary = vibrations.assemble(identifier)
+        except (OSError, ValueError) as e:
+            log_error(f"Failed to assemble the Hessian for {identifier}: {e}")
+            return TASK_STATUS["FAILED"], None
+        log_info(f"Finite-difference frequencies for {identifier}: {len(real)} real, {len(imaginary)} imaginary.")
+        return TASK_STATUS["SUCCESS"], None
+    for index in unfinished:
+        is_running, job_id = check_slurm_job_running(directories[index])
+        if is_running:
+            return TASK_STATUS["IN_PROGRESS"], job_id.split('_')[0]
+    if not allow_retry:
+        return TASK_STATUS["MAX_RETRY_REACHED"], None
+    log_info(f"{len(unfinished)} of {len(directories)} displaced single point(s) of {identifier} did not finish; "
+             f"resubmitting them.")
+    for index in unfinished:
+        vibrations.archive_output(directories[index])
+    job_id = submit_displacements(identifier, unfinished)
+    if job_id:
+        return TASK_STATUS["RETRY"], job_id
+    log_info("Failed to resubmit the job.")
+    return TASK_STATUS["FAILED"], None
+
+
+# 检查 OUTCAR 文件并处理重试，返回 (状态, 作业 ID)；allow_retry 为 False 时不重新提交，返回 MAX_RETRY_REACHED
+def check_outcar_and_retry(identifier, allow_retry=True):
+    try:
+        if relax_converged(identifier):
+            log_info(f"Calculation for {identifier} successfully completed.")
+            return TASK_STATUS["SUCCESS"], None
+    except OSError as e:
+        log_error(f"Error checking output for {identifier}: {e}")
+        return TASK_STATUS["FAILED"], None
+    is_running, job_id = check_slurm_job_running(identifier)
+    if is_running:
+        return TASK_STATUS["IN_PROGRESS"], job_id
+    if not allow_retry:
+        return TASK_STATUS["MAX_RETRY_REACHED"], None
+    job_id = backup_and_resubmit(identifier)
+    if job_id:
+        return TASK_STATUS["RETRY"], job_id
+    else:
+        log_info("Failed to resubmit the job.")
+        return TASK_STATUS["FAILED"], None
+
+
+# 检查 thermal OUTCAR 文件并处理重试，返回 (状态, 作业 ID)
+def thermalcheck_outcar_and_retry(identifier, allow_retry=True):
+    summary = outcar_summary(identifier)
+    if summary and summary.total_cpu_time:
+        log_info(f"Calculation for {identifier} successfully completed.")
+        return TASK_STATUS["SUCCESS"], None
+    log_info(f"Calculation for {identifier} failed: 'Total CPU time' not found in OUTCAR.")
+    is_running, job_id = check_slurm_job_running(identifier)
+    if is_running:
+        return TASK_STATUS["IN_PROGRESS"], job_id
+    if not allow_retry:
+        return TASK_STATUS["MAX_RETRY_REACHED"], None
+    job_id = backup_and_resubmit(identifier)
+    if job_id:
+        return TASK_STATUS["RETRY"], job_id
+    else:
+        log_info("Failed to resubmit the job.")
+        return TASK_STATUS["FAILED"], None
+
+
+# 材料几何优化任务管理
+def slab_job(identifier, top_layer=TOP_LAYER):
+    target_dir = os.path.join(".", identifier)
+    if os.path.isdir(target_dir):
+        log_info(f"Directory for {identifier} already exists.")
+        slurm_files = glob.glob(os.path.join(".", identifier, "slurm-*.out"))
+        if slurm_files:
+            log_info("slurm files found.")
+            is_running, job_id = check_slurm_job_running(identifier)
+            if is_running:
+                log_info(f"Job is still running for {identifier}. Skipping new submission.")
+                return job_id
+        else:
+            log_info("slurm files not found.")
+        outcar_file = os.path.join(".", identifier, "OUTCAR")
+        if os.path.isfile(outcar_file):
+            log_info("OUTCAR file found. Checking calculation status...")
+            _, job_id = check_outcar_and_retry(identifier, allow_retry=False)
+            if job_id:
+                return job_id
+        else:
+            log_info("OUTCAR file not found. Submitting new job...")
+            job_id = submit_job(identifier, "slab")
+            if job_id:
+                return job_id
+    else:
+        log_info(f"No existing directory for {identifier}. Creating and submitting job...")
+        run_builder(build_slab, identifier, int(top_layer), verbose=False)
+        if not os.path.isdir(target_dir):
+            raise FlowError(f"Error: Failed to create directory for {identifier}.")
+        job_id = submit_job(identifier, "slab")
+        if job_id:
+            return job_id
+    log_info(f"No action taken for {identifier}.")
+    return None
+
+
+# 在指定目录中执行检查函数
+def check_in(directory, check, identifier, *args):
+    with change_directory(directory):
+        return check(identifier, *args)
+
+
+# 在指定目录中执行记录函数
+def record_in(directory, record, *args):
+    with change_directory(directory):
+        record(*args)
+
+
+class Flow:
+    """
+    一个 (材料, 吸附位点, 净电荷) 组合的吸附计算流程。
+
+    :param mat: 催化剂名称，slab 计算目录为 ./{mat}
+    :param adsorbates: 吸附物名称列表
+    :param site_index: 吸附位点：原子编号，或 sites.py 枚举的位点标签（如 hollow0）
+    :param net_charge: 系统净电荷
+    :param top_layer: 放开的 top 原子层数
+    :param name: 吸附计算目录名，默认与 mat 相同；同一材料有多个位点或电荷时用于区分目录
+    """
+
+    def __init__(self, mat, adsorbates, site_index, net_charge, top_layer=TOP_LAYER, name=None):
+        self.mat = mat
+        self.adsorbates = list(adsorbates)
+        self.site_index = str(site_index)
+        self.net_charge = str(net_charge)
+        self.top_layer = str(top_layer)
+        self.name = name or mat
+        # 电荷扫描时，{(吸附物, "ads"/"far"): ChargeSweep}，由 charge_sweep_flows 设置
+        self.sweeps = {}
+        # 批量生成输入的结果：{(吸附物, "ads"/"far"): 失败原因}，None 表示尚未生成
+        self.input_errors = None
+        # {吸附物: far 参考的计算目录名（不含 far- 前缀）}，见 far_calc
+        self.far_calcs = {}
+
+    # far 参考的计算目录名：与位点无关，同一 (材料, 吸附物, 电荷, 计算设置) 的所有流程共用一个目录与依赖图节点；
+    # 已有旧布局的 far-{name} 目录时继续使用
+    def far_calc(self, ads):
+        if ads not in self.far_calcs:
+            far_dir = far_reference_dir(self.mat, ads, int(self.net_charge), self.name, int(self.top_layer))
+            self.far_calcs[ads] = os.path.basename(far_dir)[len("far-"):]
+        return self.far_calcs[ads]
+
+    def calc_name(self, ads, kind):
+        return "far-" + self.far_calc(ads) if kind == "far" else self.name
+
+    # 首次需要生成输入时，一次生成本流程所有缺少的 ads / far 目录（基底 CONTCAR 只读取一次，进程池并行）；
+    # 电荷扫描中的目录由 ChargeSweep 按整组电荷一次生成
+    def build_inputs(self, identifier, kind):
+        sweep = self.sweeps.get((identifier, kind))
+        if sweep is not None:
+            sweep.build()
+        elif self.input_errors is None:
+            self.input_errors = {}
+            jobs = []
+            for ads in self.adsorbates:
+                for far in ((False, True) if int(self.net_charge) != 0 else (False,)):
+                    key = (ads, "far" if far else "ads")
+                    target = os.path.join("..", ads, self.calc_name(*key))
+                    if key not in self.sweeps and not os.path.isdir(target):
+                        jobs.append((ads, {self.far_calc(ads) if far else self.name: int(self.net_charge)}, far))
+            if jobs:
+                log_info(f"Building {len(jobs)} adsorbate input(s) on {self.mat} in one batch.")
+                results = run_builder(build_adsorbates, self.mat, jobs, int(self.top_layer), self.site_index)
+                for (ads, _, far), result in zip(jobs, results):
+                    if isinstance(result, Exception):
+                        self.input_errors[(ads, "far" if far else "ads")] = result
+        error = (self.input_errors or {}).pop((identifier, kind), None)
+        if error is not None:
+            raise FlowError(f"Error: build_adsorbate failed for {identifier} ({kind}). Details: {error}")
+        if not os.path.isdir(os.path.join("..", identifier, self.calc_name(identifier, kind))):
+            # 批量生成之后目录被删除（如重新计算）时单独生成
+            run_builder(build_adsorbate, self.mat, identifier, int(self.net_charge), int(self.top_layer),
+                        self.site_index, self.far_calc(identifier) if kind == "far" else self.name,
+                        far=kind == "far")
+
+    # 吸附物几何优化任务管理（调用 adsorbate.build_adsorbate）
+    def ads_job(self, identifier):
+        target_dir = os.path.join("..", identifier, self.name)
+        if os.path.isdir(target_dir):
+            log_info(f"Directory for {identifier} already exists.")
+            with change_directory(os.path.join("..", identifier)):
+                slurm_files = glob.glob(os.path.join('.', self.name, "slurm-*.out"))
+                if slurm_files:
+                    log_info("slurm files found.")
+                    is_running, job_id = check_slurm_job_running(self.name)
+                    if is_running:
+                        log_info(f"Job is still running for {identifier}. Skipping new submission.")
+                        return job_id
+                else:
+                    log_info("slurm files not found.")
+                outcar_file = os.path.join('.', self.name, "OUTCAR")
+                if os.path.isfile(outcar_file):
+                    log_info("OUTCAR file found. Checking calculation status...")
+                    _, job_id = check_outcar_and_retry(self.name, allow_retry=False)
+                    if job_id:
+                        return job_id
+                else:
+                    log_info("OUTCAR file not found. Submitting new job...")
+                    job_id = submit_job(self.name, "ads")
+                    if job_id:
+                        return job_id
+        else:
+            log_info(f"No existing directory for {identifier}. Creating and submitting job...")
+            self.build_inputs(identifier, "ads")
+            if not os.path.isdir(target_dir):
+                raise FlowError(f"Error: Failed to create directory for {identifier}.")
+            with change_directory(os.path.join("..", identifier)):
+                job_id = submit_job(self.name, "ads")
+                if job_id:
+                    return job_id
+        log_info(f"No action taken for {identifier}.")
+        return None
+
+    # 新增：吸附物几何优化任务管理（非零净电荷时额外生成 far 参考结构）
+    def far_ads_job(self, identifier):
+        far_mat = self.calc_name(identifier, "far")
+        target_dir = os.path.join("..", identifier, far_mat)
+        if os.path.isdir(target_dir):
+            log_info(f"Directory for {identifier} (far version) already exists.")
+            with change_directory(os.path.join("..", identifier)):
+                slurm_files = glob.glob(os.path.join('.', far_mat, "slurm-*.out"))
+                if slurm_files:
+                    log_info("slurm files found in far directory.")
+                    is_running, job_id = check_slurm_job_running(far_mat)
+                    if is_running:
+                        log_info(f"Job is still running for {identifier} (far version). Skipping new submission.")
+                        return job_id
+                else:
+                    log_info("slurm files not found in far directory.")
+                outcar_file = os.path.join('.', far_mat, "OUTCAR")
+                if os.path.isfile(outcar_file):
+                    log_info("OUTCAR file found in far directory. Checking calculation status...")
+                    _, job_id = check_outcar_and_retry(far_mat, allow_retry=False)
+                    if job_id:
+                        return job_id
+                else:
+                    log_info("OUTCAR file not found in far directory. Submitting new job...")
+                    job_id = submit_job(far_mat, "far")
+                    if job_id:
+                        return job_id
+        else:
+            log_info(f"No existing far directory for {identifier}. Creating and submitting job...")
+            self.build_inputs(identifier, "far")
+            if not os.path.isdir(target_dir):
+                raise FlowError(f"Error: Failed to create far directory for {identifier}.")
+            with change_directory(os.path.join("..", identifier)):
+                job_id = submit_job(far_mat, "far")
+                if job_id:
+                    return job_id
+        log_info(f"No action taken for {identifier}.")
+        return None
+
+    # 热力学任务管理
+    def thermal_job(self, identifier):
+        target_dir = os.path.join("..", identifier, '2-thermal', self.name)
+        if os.path.isdir(target_dir):
+            log_info(f"Directory for 2-thermal {identifier} already exists.")
+            with change_directory(os.path.join("..", identifier, '2-thermal')):
+                slurm_files = glob.glob(os.path.join('.', self.name, "slurm-*.out"))
+                if slurm_files:
+                    log_info("slurm files found.")
+                    is_running, job_id = check_slurm_job_running(self.name)
+                    if is_running:
+                        log_info(f"Job is still running for 2-thermal {identifier}. Skipping new submission.")
+                        return job_id
+                else:
+                    log_info("slurm files not found.")
+                outcar_file = os.path.join('.', self.name, "OUTCAR")
+                if os.path.isfile(outcar_file):
+                    log_info("OUTCAR file found. Checking calculation status...")
+                    _, job_id = thermalcheck_outcar_and_retry(self.name, allow_retry=False)
+                    if job_id:
+                        return job_id
+                else:
+                    log_info("OUTCAR file not found. Submitting new job...")
+                    job_id = submit_job(self.name, "thermal")
+                    if job_id:
+                        return job_id
+        else:
+            with change_directory(os.path.join('..', identifier)):
+                subprocess.check_call([R2T_SCRIPT, self.name])
+            run_builder(build_thermal, self.mat, identifier, self.site_index, self.name)
+            log_info(f"Created directory for thermal calculations at {target_dir}")
+            with change_directory(os.path.join('..', identifier, '2-thermal')):
+                log_info("Submitting thermal calculation...")
+                job_id = submit_job(self.name, "thermal")
+                if job_id:
+                    return job_id
+        log_info(f"No action taken for {identifier}.")
+        return None
+
+    # 有限差分热力学任务管理：由热力学计算目录生成位移单点计算，以 job array 提交
+    def thermal_array_job(self, identifier):
+        thermal_dir = os.path.join('..', identifier, '2-thermal')
+        target_dir = os.path.join(thermal_dir, self.name)
+        if not os.path.isfile(os.path.join(target_dir, vibrations.DISPLACEMENTS_FILE)):
+            with change_directory(os.path.join('..', identifier)):
+                subprocess.check_call([R2T_SCRIPT, self.name])
+            run_builder(build_thermal, self.mat, identifier, self.site_index, self.name)
+            directories = run_builder(vibrations.write_displacements, target_dir)
+            log_info(f"Created {len(directories)} displaced single point(s) for 2-thermal {identifier}.")
+            with change_directory(thermal_dir):
+                return submit_displacements(self.name)
+        with change_directory(thermal_dir):
+            _, job_id = check_displacements_and_retry(self.name, allow_retry=False)
+            if job_id:
+                return job_id
+            unfinished = [index for index, directory in enumerate(vibrations.displacement_dirs(self.name))
+                          if not os.path.isfile(os.path.join(directory, "OUTCAR"))]
+            if unfinished:
+                log_info(f"Submitting {len(unfinished)} displaced single point(s) for 2-thermal {identifier}...")
+                return submit_displacements(self.name, unfinished)
+        return None
+
+    # 结合能计算：净电荷为0时相对于 slab 与分子，否则相对于 far 参考结构；结果写入共享结果库
+    def binding_job(self, identifier):
+        if int(self.net_charge) == 0:
+            run_builder(compute_binding, self.mat, identifier, self.name, self.site_index, 0, RESULTS)
+        else:
+            run_builder(compute_far_binding, self.mat, identifier, self.name, self.site_index, int(self.net_charge),
+                        RESULTS, far_dir=os.path.join("..", identifier, self.calc_name(identifier, "far")))
+        return None
+
+    def add_to_graph(self, graph):
+        """
+        将本流程的每个 (材料, 吸附物, 阶段) 节点加入依赖图：
+        slab -> ads -> thermal，slab -> far (净电荷不为0时)，ads (+ far) -> binding。
+        同一材料的 slab 节点由所有流程共享。
+        """
+        slab_key = (self.mat, "", "slab")
+        graph.add(Node(slab_key,
+                       submit=lambda: slab_job(self.mat, self.top_layer),
+                       check=lambda allow_retry: check_outcar_and_retry(self.mat, allow_retry),
+                       on_success=lambda: record_energy(self.mat, self.mat, "slab"),
+                       max_retries=RETRY_BUDGETS["slab"],
+                       directory=os.path.join(".", self.mat)))
+        for ads in self.adsorbates:
+            ads_dir = os.path.join('..', ads)
+            thermal_dir = os.path.join('..', ads, '2-thermal')
+            ads_key = (self.name, ads, "ads")
+            graph.add(Node(ads_key,
+                           submit=lambda ads=ads: self.ads_job(ads),
+                           check=lambda allow_retry, ads_dir=ads_dir: check_in(ads_dir, check_outcar_and_retry, self.name,
+                                                                             allow_retry),
+                           deps=[slab_key],
+                           on_success=lambda ads=ads, ads_dir=ads_dir: record_in(
+                               ads_dir, record_energy, self.name, self.mat, "ads", ads, self.site_index,
+                               self.net_charge),
+                           max_retries=RETRY_BUDGETS["ads"],
+                           directory=os.path.join(ads_dir, self.name)))
+            binding_deps = [ads_key]
+            if int(self.net_charge) != 0:
+                # far 参考与位点无关：同一 (材料, 吸附物, 电荷, 计算设置) 的流程共用同一个节点
+                far_name = self.calc_name(ads, "far")
+                far_key = (self.far_calc(ads), ads, "far")
+                graph.add(Node(far_key,
+                               submit=lambda ads=ads: self.far_ads_job(ads),
+                               check=lambda allow_retry, ads_dir=ads_dir, far_name=far_name: check_in(
+                                   ads_dir, check_outcar_and_retry, far_name, allow_retry),
+                               deps=[slab_key],
+                               on_success=lambda ads=ads, ads_dir=ads_dir, far_name=far_name: record_in(
+                                   ads_dir, record_energy, far_name, self.mat, "far", ads, "", self.net_charge),
+                               max_retries=RETRY_BUDGETS["far"],
+                               directory=os.path.join(ads_dir, far_name)))
+                binding_deps.append(far_key)
+            # 吸附物弛豫收敛后立即提交热力学计算，不等待其他吸附物
+            array_mode = THERMAL_MODE == "array"
+            graph.add(Node((self.name, ads, "thermal"),
+                           submit=lambda ads=ads: (self.thermal_array_job if array_mode else self.thermal_job)(ads),
+                           check=lambda allow_retry, thermal_dir=thermal_dir: check_in(
+                               thermal_dir, check_displacements_and_retry if array_mode else
+                               thermalcheck_outcar_and_retry, self.name, allow_retry),
+                           deps=[ads_key],
+                           on_success=lambda ads=ads, thermal_dir=thermal_dir: record_in(
+                               thermal_dir, record_vibrations if array_mode else record_gcorr, self.name, self.mat,
+                               ads, self.site_index, self.net_charge),
+                           max_retries=RETRY_BUDGETS["thermal"],
+                           directory=os.path.join(thermal_dir, self.name)))
+            graph.add(Node((self.name, ads, "binding"),
+                           submit=lambda ads=ads: self.binding_job(ads),
+                           check=lambda allow_retry: (TASK_STATUS["SUCCESS"], None),
+                           deps=binding_deps))
+        return graph
+
+
+class ChargeSweep:
+    """
+    同一 (材料, 吸附物, 位点) 的一组电荷：吸附结构与输入文件只生成一次，按电荷复制为只有 NELECT 不同的目录。
+    第一个需要输入的流程触发整组的生成；各流程随后照常以 submit_job 提交自己的目录，
+    由 ARRAYS 与同阶段的其他目录一起打包为 job array，并受在途作业上限约束。
+
+    :param adsorbate: 吸附物名称
+    :param flows: 同一材料、位点，不同电荷的 Flow 列表
+    :param far: 为 True 时处理 far 参考结构
+    """
+
+    def __init__(self, adsorbate, flows, far=False):
+        self.adsorbate = adsorbate
+        self.flows = list(flows)
+        self.far = far
+        self.built = False
+
+    def dir_name(self, flow):
+        return flow.calc_name(self.adsorbate, "far" if self.far else "ads")
+
+    def build(self):
+        # 只尝试一次；失败时各流程在 build_inputs 中单独生成
+        if self.built:
+            return
+        self.built = True
+        # 已存在的目录（如重启流程时）不再生成
+        missing = [flow for flow in self.flows
+                   if not os.path.isdir(os.path.join("..", self.adsorbate, self.dir_name(flow)))]
+        if not missing:
+            return
+        first = missing[0]
+        log_info(f"Building {len(missing)} charge state(s) of {self.adsorbate} on {first.mat} "
+                 f"({'far' if self.far else 'ads'}) from one geometry.")
+        run_builder(build_adsorbate_charges, first.mat, self.adsorbate,
+                    {flow.far_calc(self.adsorbate) if self.far else flow.name: int(flow.net_charge) for flow in missing},
+                    int(first.top_layer), first.site_index, far=self.far)
+
+
+def charge_sweep_flows(mat, adsorbates, site_index, charges, top_layer=TOP_LAYER, names=None):
+    """
+    电荷扫描：为每个电荷创建一个 Flow，同一吸附物的 ads 与 far 计算分别共享一个 ChargeSweep。
+
+    :param charges: 净电荷列表
+    :param names: {电荷: 吸附计算目录名}，默认为 {mat}_q{电荷}
+    :return: Flow 列表
+    """
+    names = names or {charge: f"{mat}_q{charge}" for charge in charges}
+    flows = [Flow(mat, adsorbates, site_index, charge, top_layer, name=names[charge]) for charge in charges]
+    charged = [flow for flow in flows if int(flow.net_charge) != 0]
+    for ads in adsorbates:
+        ads_sweep = ChargeSweep(ads, flows)
+        far_sweep = ChargeSweep(ads, charged, far=True)
+        for flow in flows:
+            flow.sweeps[(ads, "ads")] = ads_sweep
+        for flow in charged:
+            flow.sweeps[(ads, "far")] = far_sweep
+    return flows
+
+
+def site_flows(mat, adsorbates, sites, charges, top_layer=TOP_LAYER):
+    """
+    将一个材料的 位点 × 电荷 展开为 Flow 列表，每个 Flow 计算全部吸附物。
+    只有一个组合时吸附计算目录名与材料相同，否则为 {材料}_s{位点}_q{电荷}；
+    同一位点有多个电荷时按电荷扫描处理。
+
+    :param sites: 位点列表；"auto" 表示 sites.py 枚举的全部对称性独立位点（top / bridge / hollow）
+    :param charges: 净电荷列表
+    """
+    if sites == "auto" or sites == ["auto"]:
+        sites = site_labels(mat)
+        log_info(f"Enumerated {len(sites)} symmetry-unique site(s) on {mat}: {', '.join(sites)}")
+    if len(sites) * len(charges) == 1:
+        return [Flow(mat, adsorbates, sites[0], charges[0], top_layer)]
+    flows = []
+    for site in sites:
+        names = {charge: f"{mat}_s{site}_q{charge}" for charge in charges}
+        if len(charges) > 1:
+            flows.extend(charge_sweep_flows(mat, adsorbates, site, charges, top_layer, names))
+        else:
+            flows.append(Flow(mat, adsorbates, site, charges[0], top_layer, name=names[charges[0]]))
+    return flows
+
+
+def build_graph(flows, scheduler=None, max_in_flight=None, use_job_arrays=USE_JOB_ARRAYS, metrics=None, state=None,
+                retry_budget=MAX_TOTAL_RETRIES):
+    """
+    将多个流程放入同一个依赖图，共享轮询器与在途作业上限。
+
+    :param flows: Flow 列表
+    :param scheduler: 调度后端，默认为 SCHEDULER
+    :param max_in_flight: 同时在队列中的任务数上限（整个 job array 按其任务数计），None 表示不限制
+    :param use_job_arrays: 是否将同一轮调度中同阶段的提交打包为 job array
+    :param metrics: 分阶段计时记录，默认写入 METRICS_FILE / PROMETHEUS_FILE
+    :param state: 节点状态、作业号与隔离名单的持久化记录，默认为 STATE_FILE；重启时由其恢复节点，不再逐个扫描目录
+    :param retry_budget: 本次运行中重新提交的总数上限，None 表示不限制
+    """
+    if metrics is None and (METRICS_FILE or PROMETHEUS_FILE):
+        metrics = FlowMetrics(METRICS_FILE or None, PROMETHEUS_FILE)
+    graph = FlowGraph(scheduler or SCHEDULER, max_in_flight=max_in_flight, batcher=ARRAYS if use_job_arrays else None,
+                      metrics=metrics, state=state or FlowState(STATE_FILE, verify=VERIFY_STATE), retry_budget=retry_budget)
+    for flow in flows:
+        flow.add_to_graph(graph)
+    return graph
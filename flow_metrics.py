@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import datetime
+
+from flow_dag import NOT_EXECUTED, TERMINAL
+from outcar import elapsed_time
+
+# 作业仍在排队的 SLURM 状态；RUNNING / COMPLETING 表示已开始运行，其余状态（含 GONE）表示已离开队列
+QUEUED_STATES = ("PENDING", "CONFIGURING", "REQUEUED", "RESIZING", "SUSPENDED")
+RUNNING_STATES = ("RUNNING", "COMPLETING")
+
+# Prometheus 指标：(名称, 说明, 节点记录中的字段)
+PROMETHEUS_METRICS = (
+    ("netchg_node_blocked_seconds", "Time a node waited for its upstream nodes.", "blocked_s"),
+    ("netchg_node_throttled_seconds", "Time a ready node waited for an in-flight slot.", "throttled_s"),
+    ("netchg_node_queue_wait_seconds", "Total time the node's jobs spent queued.", "queue_wait_s"),
+    ("netchg_node_run_seconds", "Total time the node's jobs spent running.", "run_s"),
+    ("netchg_node_vasp_elapsed_seconds", "VASP wall time of the final run, from the OUTCAR.", "vasp_elapsed_s"),
+    ("netchg_node_total_seconds", "Time from the start of the flow to the node finishing.", "total_s"),
+    ("netchg_node_retries", "Resubmissions of the node.", "retries"),
+)
+
+
+def log_error(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ERROR: {message}", file=sys.stderr)
+
+
+def _duration(start, end):
+    return round(end - start, 3) if start is not None and end is not None else None
+
+
+def _sum(values):
+    values = [value for value in values if value is not None]
+    return round(sum(values), 3) if values else None
+
+
+class NodeTiming:
+    """
+    一个节点的计时记录：依赖满足、提交、结束的时间与每次提交的作业 {作业号: {submit, start, end}}。
+    """
+
+    def __init__(self, created):
+        self.created = created
+        self.ready = None
+        self.submitted = None
+        self.finished = None
+        self.job_id = None
+        self.jobs = {}
+
+
+class FlowMetrics:
+    """
+    依赖图的分阶段计时：记录每个节点的依赖等待、排队、运行时间、OUTCAR 中的 VASP 运行时间与重试次数。
+    节点结束时向 JSON lines 文件追加一条记录，run 结束时追加一条汇总；可选以 Prometheus textfile 格式
+    （node_exporter 的 textfile collector）写出各节点与各阶段的指标。
+
+    时间精度为一个轮询周期：作业开始运行与离开队列的时间取自轮询器的状态变化通知，
+    作业在两次轮询之间完成时没有开始时间，其排队时间记为 None。
+
+    :param path: JSON lines 文件路径，None 时不写出
+    :param prometheus_path: Prometheus textfile 路径，None 时不写出
+    """
+
+    def __init__(self, path=None, prometheus_path=None):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.timings = {}
+        self.records = {}
+        self.job_nodes = {}
+        self.started = None
+
+    def attach(self, graph):
+        """
+        开始记录 graph 的节点；由 FlowGraph 在第一次调度前调用。
+        """
+        self.started = time.time()
+        graph.poller.subscribe(self.job_state)
+
+    def job_state(self, job_id, old, new):
+        # 轮询器的状态变化回调
+        key = self.job_nodes.get(job_id)
+        if key is None:
+            return
+        job = self.timings[key].jobs[job_id]
+        now = time.time()
+        if new in RUNNING_STATES:
+            job.setdefault("start", now)
+        elif new not in QUEUED_STATES and new is not None:
+            job.setdefault("end", now)
+
+    def update(self, graph):
+        """
+        在每轮调度结束时记录节点状态的变化。
+        """
+        now = time.time()
+        for node in graph.nodes.values():
+            timing = self.timings.setdefault(node.key, NodeTiming(self.started or now))
+            if timing.ready is None and (node.status != NOT_EXECUTED or graph.dependencies_met(node)):
+                timing.ready = now
+            if node.job_id and node.job_id != timing.job_id and not graph.is_placeholder(node.job_id):
+                timing.job_id = job_id = str(node.job_id)
+                timing.submitted = timing.submitted or now
+                timing.jobs.setdefault(job_id, {"submit": now})
+                self.job_nodes[job_id] = node.key
+            if node.key not in self.records and node.status in TERMINAL:
+                timing.finished = now
+                self.records[node.key] = self.record(node, timing)
+                self._write(self.records[node.key])
+
+    def record(self, node, timing):
+        """
+        节点结束时的计时记录（写入 JSON lines 的一行）。
+        """
+        jobs = []
+        for job_id, job in timing.jobs.items():
+            # 离开队列的时间未被观察到时（如流程结束前最后一轮），以节点结束时间代替
+            end = job.get("end", timing.finished)
+            jobs.append({"job_id": job_id, "submit": job["submit"], "start": job.get("start"), "end": end,
+                         "queue_wait_s": _duration(job["submit"], job.get("start")),
+                         "run_s": _duration(job.get("start"), end)})
+        directory = getattr(node, "directory", None)
+        outcar = os.path.join(directory, "OUTCAR") if directory else None
+        vasp_elapsed = None
+        if outcar and os.path.isfile(outcar):
+            try:
+                vasp_elapsed = elapsed_time(outcar)
+            except OSError as e:
+                log_error(f"Failed to read the elapsed time from {outcar}: {e}")
+        material, adsorbate, stage = (tuple(node.key) + ("", "", ""))[:3]
+        return {
+            "event": "node",
+            "node": "/".join(str(k) for k in node.key),
+            "material": material,
+            "adsorbate": adsorbate,
+            "stage": stage,
+            "status": node.status,
+            "retries": node.retries,
+            "ready": timing.ready,
+            "submitted": timing.submitted,
+            "finished": timing.finished,
+            "blocked_s": _duration(timing.created, timing.ready),
+            "throttled_s": _duration(timing.ready, timing.submitted),
+            "queue_wait_s": _sum(job["queue_wait_s"] for job in jobs),
+            "run_s": _sum(job["run_s"] for job in jobs),
+            "vasp_elapsed_s": vasp_elapsed,
+            "total_s": _duration(timing.created, timing.finished),
+            "directory": directory,
+            "jobs": jobs,
+        }
+
+    def summary(self):
+        """
+        按阶段汇总：{阶段: {nodes, retries, blocked_s, queue_wait_s, run_s, vasp_elapsed_s}}，时间为各节点之和。
+        """
+        stages = {}
+        for record in self.records.values():
+            stage = stages.setdefault(record["stage"], {"nodes": 0, "retries": 0})
+            stage["nodes"] += 1
+            stage["retries"] += record["retries"]
+            for field in ("blocked_s", "queue_wait_s", "run_s", "vasp_elapsed_s"):
+                stage[field] = _sum([stage.get(field), record[field]])
+        return stages
+
+    def finish(self, success):
+        """
+        run 结束时写出汇总与 Prometheus textfile。
+        """
+        self._write({"event": "flow", "success": success, "started": self.started, "finished": time.time(),
+                     "wall_s": _duration(self.started, time.time()), "stages": self.summary()})
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def _write(self, record):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            log_error(f"Failed to write metrics to {self.path}: {e}")
+
+    def write_prometheus(self, path):
+        """
+        以 Prometheus 文本格式写出指标；先写临时文件再替换，避免 node_exporter 读到不完整的文件。
+        """
+        lines = []
+        for name, description, field in PROMETHEUS_METRICS:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            for record in self.records.values():
+                if record[field] is None:
+                    continue
+                labels = ",".join(f'{label}="{record[label]}"' for label in ("material", "adsorbate", "stage"))
+                lines.append(f"{name}{{{labels}}} {record[field]}")
+        lines.append("# HELP netchg_stage_nodes Finished nodes per stage and status.")
+        lines.append("# TYPE netchg_stage_nodes gauge")
+        counts = {}
+        for record in self.records.values():
+            counts[(record["stage"], record["status"])] = counts.get((record["stage"], record["status"]), 0) + 1
+        for (stage, status), count in sorted(counts.items()):
+            lines.append(f'netchg_stage_nodes{{stage="{stage}",status="{status}"}} {count}')
+        temporary = f"{path}.tmp"
+        try:
+            with open(temporary, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(temporary, path)
+        except OSError as e:
+            log_error(f"Failed to write Prometheus metrics to {path}: {e}")
+
+
+if __name__ == "__main__":
+    # 用法: python flow_metrics.py [flow-metrics.jsonl]    按阶段打印节点计时
+    path = sys.argv[1] if len(sys.argv) > 1 else "flow-metrics.jsonl"
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    fields = ("retries", "blocked_s", "throttled_s", "queue_wait_s", "run_s", "vasp_elapsed_s", "total_s")
+    print("\t".join(("node", "status") + fields))
+    for record in records:
+        if record["event"] == "node":
+            print("\t".join(str(record[field]) for field in ("node", "status") + fields))
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import datetime
+
+from flow_dag import NOT_EXECUTED, IN_PROGRESS, RETRY, SUCCESS, MAX_RETRY_REACHED
+from job_array import PLACEHOLDER_PREFIX
+from outcar_cache import tail_hash
+
+# 依赖图节点状态的持久化文件（相对于 flow 的运行目录）
+STATE_FILE = "flow-state.json"
+
+
+def log_info(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] INFO: {message}")
+
+
+def log_error(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ERROR: {message}", file=sys.stderr)
+
+
+def node_name(key):
+    return "/".join(str(k) for k in key)
+
+
+def result_checksum(directory):
+    """
+    计算目录中 OUTCAR 的校验值 "大小:末尾内容的 SHA1"，没有 OUTCAR 时返回 None。
+    """
+    outcar = os.path.join(directory, "OUTCAR")
+    if not os.path.isfile(outcar):
+        return None
+    return f"{os.path.getsize(outcar)}:{tail_hash(outcar)}"
+
+
+class FlowState:
+    """
+    依赖图节点状态的持久化记录：每个节点的状态（TASK_STATUS 中的值）、已用的重试次数、作业号、
+    成功节点结果（OUTCAR）的校验值，以及隔离名单。
+
+    流程重启时只读取这一个文件：已成功的节点直接视为成功，不再检查目录、slurm-*.out 或 OUTCAR；
+    记录中仍在队列的作业恢复跟踪，由一次批量 squeue 确认是否仍在运行；其余节点按原方式检查目录。
+    重试次数跨重启累计，隔离名单中的节点不再提交，直到用 release() 解除。
+
+    文件先写入临时文件并 fsync，再以 os.replace 替换，进程或节点在写入过程中崩溃也不会留下不完整的文件。
+    多个流程（如同一 Support 目录下的多个 flow-binding.py）共用一个文件：写入时持有文件锁，重新读取文件，
+    只以本进程改动过的节点与隔离条目覆盖文件中的记录，不会丢失其他进程的更新。
+
+    :param path: 状态文件路径
+    :param verify: 为 True 时，恢复成功节点前重新计算 OUTCAR 校验值，不一致（如目录被修改或删除）时重新检查
+    """
+
+    def __init__(self, path=STATE_FILE, verify=False):
+        self.path = path
+        self.verify = verify
+        self.nodes = {}
+        self.quarantine = {}
+        self.dirty = False
+        # 本进程改动过的节点、加入隔离名单与解除隔离的节点名，写入时与文件中的记录合并
+        self.changed = set()
+        self.quarantined = set()
+        self.released = set()
+        if os.path.isfile(path):
+            self.load()
+
+    def _read(self):
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log_error(f"Ignoring unreadable flow state {self.path}: {e}")
+            return {}
+
+    def load(self):
+        data = self._read()
+        self.nodes = data.get("nodes", {})
+        self.quarantine = data.get("quarantine", {})
+
+    def save(self):
+        """
+        状态有变化时，在文件锁内重新读取文件，合并本进程的改动后写入。
+        """
+        if not self.dirty:
+            return
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(f"{self.path}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                data = self._read()
+                nodes = data.get("nodes", {})
+                nodes.update((name, self.nodes[name]) for name in self.changed if name in self.nodes)
+                quarantine = data.get("quarantine", {})
+                for name in self.released:
+                    quarantine.pop(name, None)
+                quarantine.update((name, self.quarantine[name]) for name in self.quarantined
+                                  if name in self.quarantine)
+                with open(temporary, "w") as f:
+                    json.dump({"nodes": nodes, "quarantine": quarantine}, f, indent=1, sort_keys=True)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporary, self.path)
+            # 同时取得其他进程写入的记录
+            self.nodes, self.quarantine = nodes, quarantine
+            self.changed, self.quarantined, self.released = set(), set(), set()
+            self.dirty = False
+        except OSError as e:
+            log_error(f"Failed to save flow state to {self.path}: {e}")
+
+    def restore(self, node):
+        """
+        按记录恢复节点：重试次数继续累计；隔离名单中的节点置为 MAX_RETRY_REACHED；
+        成功的节点置为 SUCCESS；仍在队列中的作业恢复为 IN_PROGRESS / RETRY 并保留作业号。
+        """
+        name = node_name(node.key)
+        entry = self.nodes.get(name)
+        if entry:
+            node.retries = max(node.retries, entry.get("retries", 0))
+        if name in self.quarantine:
+            node.status = MAX_RETRY_REACHED
+            log_info(f"{node} is quarantined ({self.quarantine[name]['reason']}); "
+                     f"release it with 'python flow_state.py --release {name}'.")
+            return
+        if not entry:
+            return
+        job_id = entry.get("job_id")
+        if entry["status"] == SUCCESS:
+            if self.verify and node.directory and result_checksum(node.directory) != entry.get("checksum"):
+                log_info(f"Result of {node} changed since it was recorded; checking it again.")
+                return
+            node.status = SUCCESS
+        elif entry["status"] in (IN_PROGRESS, RETRY) and job_id and not str(job_id).startswith(PLACEHOLDER_PREFIX):
+            node.status = entry["status"]
+            node.job_id = job_id
+
+    def update(self, node):
+        """
+        记录节点的当前状态，未变化时不标记为需要写入。
+        """
+        name = node_name(node.key)
+        entry = {"status": node.status, "retries": node.retries, "job_id": node.job_id}
+        previous = self.nodes.get(name)
+        if previous is None or any(previous.get(field) != value for field, value in entry.items()):
+            entry["updated"] = time.time()
+            if node.status == SUCCESS and node.directory:
+                try:
+                    entry["checksum"] = result_checksum(node.directory)
+                except OSError as e:
+                    log_error(f"Failed to checksum the result of {node}: {e}")
+            self.nodes[name] = entry
+            self.changed.add(name)
+            self.dirty = True
+
+    def add_quarantine(self, node, reason):
+        name = node_name(node.key)
+        self.quarantine[name] = {"reason": reason, "retries": node.retries, "since": time.time()}
+        self.quarantined.add(name)
+        self.released.discard(name)
+        self.dirty = True
+
+    def release(self, name):
+        """
+        解除隔离并清零重试次数，下次运行时重新处理该节点。
+
+        :return: 是否在隔离名单中
+        """
+        found = self.quarantine.pop(name, None) is not None
+        self.released.add(name)
+        self.quarantined.discard(name)
+        if name in self.nodes:
+            self.nodes[name].update(status=NOT_EXECUTED, retries=0, job_id=None)
+            self.changed.add(name)
+        self.dirty = True
+        return found
+
+
+if __name__ == "__main__":
+    # 用法: python flow_state.py [--state flow-state.json] [--release 节点 ...] [--summary]
+    #   打印或解除隔离名单；--summary 按状态统计节点数
+    args = sys.argv[1:]
+    path = args[args.index("--state") + 1] if "--state" in args else STATE_FILE
+    state = FlowState(path)
+    if "--release" in args:
+        for name in args[args.index("--release") + 1:]:
+            if name.startswith("--"):
+                break
+            print(f"{name}\t{'released' if state.release(name) else 'not quarantined'}")
+        state.save()
+    elif "--summary" in args:
+        counts = {}
+        for entry in state.nodes.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        for status, count in sorted(counts.items()):
+            print(f"{status}\t{count}")
+    else:
+        for name, entry in sorted(state.quarantine.items()):
+            since = datetime.datetime.fromtimestamp(entry["since"]).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{name}\t{entry['retries']} retries\t{since}\t{entry['reason']}")
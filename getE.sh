@@ -1,8 +1,11 @@
 #!/bin/sh
+# outcar.py 与本脚本位于同一目录
+script_dir=$(cd "$(dirname "$0")" && pwd)
+
 # Define function
 function Edft() {
 if [ -n "$1" ]; then
-    result=$(grep '  without' OUTCAR | tail -n 1 | awk '{print $7}')
+    result=$(python "$script_dir/outcar.py" OUTCAR)
     echo -e "$1\t$result" >> ../Edft.txt
 fi
 }
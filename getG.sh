@@ -1,9 +1,10 @@
 #!/bin/sh
+# thermo.py 与本脚本位于同一目录
+script_dir=$(cd "$(dirname "$0")" && pwd)
 
-# Define function
+# Define function：谐振子近似计算 298.15 K 下的 G 校正（代替 vaspkit 501）
 function calculate_G() {
-    echo -e "501\n298.15\n" | vaspkit > Gcorr.txt
-    echo -ne $1"\t"`grep -a 'to G(T)' Gcorr.txt | tail -n 1 | awk '{print $7}'`"\n" >> ../Gcorr.txt
+    echo -ne $1"\t"`python "$script_dir/thermo.py" OUTCAR 298.15`"\n" >> ../Gcorr.txt
 }
 
 # get G from thermal files
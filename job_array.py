@@ -0,0 +1,167 @@
+import os
+import sys
+import datetime
+import itertools
+
+# job array 的目录列表文件存放位置（相对于 flow 的运行目录）
+ARRAY_LIST_DIR = "job-arrays"
+# 未真正提交前返回给调用者的占位作业号前缀
+PLACEHOLDER_PREFIX = "pending-"
+
+
+def log_info(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] INFO: {message}")
+
+
+def log_error(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ERROR: {message}", file=sys.stderr)
+
+
+def format_indices(indices):
+    """
+    [0, 1, 2, 5, 7, 8] -> "0-2,5,7-8"，用于 sbatch --array。
+    """
+    ranges = []
+    for _, group in itertools.groupby(enumerate(sorted(indices)), key=lambda item: item[1] - item[0]):
+        group = [index for _, index in group]
+        ranges.append(str(group[0]) if len(group) == 1 else f"{group[0]}-{group[-1]}")
+    return ",".join(ranges)
+
+
+class JobArray:
+    """
+    一组以同一个目录列表文件提交的计算：第 i 个任务在列表第 i 个目录中运行。
+    记录每个任务最近一次提交的作业号，失败的任务按下标重新提交，不重复提交已成功的任务。
+
+    :param list_file: 目录列表文件路径
+    :param directories: 计算目录（绝对路径）列表
+    :param scheduler: 调度后端，需提供 submit_array(list_file, indices)，如 scheduler.SlurmScheduler
+    """
+
+    def __init__(self, list_file, directories, scheduler):
+        self.list_file = os.path.abspath(list_file)
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.scheduler = scheduler
+        self.task_ids = {}
+        self.submissions = 0
+
+    def index(self, directory):
+        return self.directories.index(os.path.abspath(directory))
+
+    def write_list(self):
+        os.makedirs(os.path.dirname(self.list_file), exist_ok=True)
+        with open(self.list_file, "w") as f:
+            f.write("".join(f"{directory}\n" for directory in self.directories))
+
+    def submit(self, indices=None):
+        """
+        提交全部任务，或只提交给定下标的任务。
+
+        :return: {目录: "作业号_任务号"}；提交失败时为空
+        """
+        if not os.path.isfile(self.list_file):
+            self.write_list()
+        indices = sorted(range(len(self.directories)) if indices is None else set(indices))
+        try:
+            job_id = self.scheduler.submit_array(self.list_file,
+                                                 indices if len(indices) != len(self.directories) else None)
+        except Exception as e:
+            log_error(f"Failed to submit job array {self.list_file}: {e}")
+            return {}
+        if not job_id:
+            return {}
+        self.submissions += 1
+        submitted = {}
+        for index in indices:
+            self.task_ids[index] = f"{job_id}_{index}"
+            submitted[self.directories[index]] = self.task_ids[index]
+        log_info(f"Submitted job array {job_id} ({format_indices(indices)}) from {os.path.basename(self.list_file)}.")
+        return submitted
+
+    def states(self, poller):
+        """
+        每个任务最近一次提交的状态：{目录: (作业号, 状态)}，状态取自轮询器。
+        """
+        return {self.directories[index]: (task_id, poller.states.get(task_id))
+                for index, task_id in sorted(self.task_ids.items())}
+
+    def resubmit_failed(self, failed):
+        """
+        只重新提交 failed(目录) 为真的任务。
+
+        :return: {目录: "作业号_任务号"}
+        """
+        indices = [index for index, directory in enumerate(self.directories) if failed(directory)]
+        return self.submit(indices) if indices else {}
+
+
+class ArrayBatcher:
+    """
+    在一轮调度中收集各节点的提交请求，结束时将同一阶段的新目录打包为一个 job array，
+    将属于已有 job array 的重试目录按下标一起重新提交。
+
+    FlowGraph 在每轮调度开始时调用 begin()，结束时调用 flush() 将占位作业号替换为真实作业号；
+    不在调度过程中（active 为 False）时，调用者应直接单独提交。
+
+    :param scheduler: 调度后端
+    :param list_dir: 目录列表文件的存放位置
+    """
+
+    def __init__(self, scheduler, list_dir=ARRAY_LIST_DIR):
+        self.scheduler = scheduler
+        self.list_dir = list_dir
+        self.active = False
+        self.arrays = []
+        self.members = {}
+        self.requests = {}
+        self._counter = itertools.count()
+
+    def register(self, array):
+        """
+        登记已提交的 job array，其中目录的重试将按下标重新提交。
+        """
+        self.arrays.append(array)
+        for directory in array.directories:
+            self.members[directory] = array
+
+    def is_placeholder(self, job_id):
+        return isinstance(job_id, str) and job_id.startswith(PLACEHOLDER_PREFIX)
+
+    def begin(self):
+        self.active = True
+
+    def request(self, directory, stage):
+        """
+        登记一个待提交目录，返回占位作业号。
+        """
+        placeholder = f"{PLACEHOLDER_PREFIX}{next(self._counter)}"
+        self.requests[placeholder] = (os.path.abspath(directory), stage)
+        return placeholder
+
+    def flush(self):
+        """
+        提交本轮收集的全部目录。
+
+        :return: {占位作业号: 真实作业号}；提交失败的占位作业号不在其中
+        """
+        self.active = False
+        requests, self.requests = self.requests, {}
+        retries, new = {}, {}
+        for placeholder, (directory, stage) in requests.items():
+            array = self.members.get(directory)
+            if array is not None:
+                retries.setdefault(id(array), (array, {}))[1][directory] = placeholder
+            else:
+                new.setdefault(stage, {})[directory] = placeholder
+
+        resolved = {}
+        for array, placeholders in retries.values():
+            submitted = array.submit(array.index(directory) for directory in placeholders)
+            resolved.update((placeholders[d], job_id) for d, job_id in submitted.items())
+        for stage, placeholders in new.items():
+            name = f"{stage}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{next(self._counter)}.list"
+            array = JobArray(os.path.join(self.list_dir, name), list(placeholders), self.scheduler)
+            self.register(array)
+            submitted = array.submit()
+            resolved.update((placeholders[d], job_id) for d, job_id in submitted.items())
+        return resolved
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def find_layers(z_coords, eps=0.5):
+    """
+    按 z 坐标分层：z 只排序一次，相邻原子 z 差大于 eps 处断开，一次 NumPy 运算完成。
+
+    :param z_coords: 每个原子的 z 坐标（笛卡尔）
+    :param eps: 两个相邻原子属于同一层的最大 z 间距
+    :return: 层列表，z 从大到小排列（top 层为第一个），每层为升序的原子索引数组
+    """
+    z = np.asarray(z_coords, dtype=float)
+    if z.size == 0:
+        return []
+    order = np.argsort(-z, kind="stable")
+    breaks = np.flatnonzero(-np.diff(z[order]) > eps) + 1
+    return [np.sort(layer) for layer in np.split(order, breaks)]
+
+
+def surface_labels(n_atoms, layers, num_top_layers):
+    """
+    将前 num_top_layers 层标记为 "surface"，其余为 "subsurface"。
+
+    :return: 长度为 n_atoms 的标签列表，可直接用作 surface_properties
+    """
+    labels = np.full(n_atoms, "subsurface", dtype=object)
+    if layers[:num_top_layers]:
+        labels[np.concatenate(layers[:num_top_layers])] = "surface"
+    return labels.tolist()
+
+
+def build_selective_dynamics(groups, movable=("surface", "adsorbate")):
+    """
+    由 surface_properties 标签生成 selective_dynamics：movable 中的组别为 T，其余为 F。
+
+    :param groups: 每个原子的组别标签
+    :param movable: 允许移动的组别
+    :return: [[bool, bool, bool], ...]
+    """
+    mask = np.isin(np.asarray(groups), list(movable))
+    return np.repeat(mask[:, np.newaxis], 3, axis=1).tolist()
@@ -0,0 +1,106 @@
+import os
+import re
+import sys
+from collections import namedtuple
+
+# 从 OUTCAR 末尾提取的信息
+#   energy: 最后一个离子步的 energy(sigma->0)，与 grep '  without' OUTCAR | tail -n 1 | awk '{print $7}' 一致
+#   required_accuracy: 是否出现 'reached required accuracy'（结构优化收敛）
+#   total_cpu_time: 是否出现 'Total CPU time'（VASP 正常结束）
+#   ionic_steps: 最后一个 Iteration 行的离子步编号
+OutcarSummary = namedtuple("OutcarSummary", ["energy", "required_accuracy", "total_cpu_time", "ionic_steps"])
+
+ENERGY_PATTERN = re.compile(rb"energy\(sigma->0\)\s*=\s*(\S+)")
+ITERATION_PATTERN = re.compile(rb"Iteration\s+(\d+)\(\s*(\d+)\)")
+ELAPSED_PATTERN = re.compile(rb"Elapsed time \(sec\):\s*(\S+)")
+# VASP 正常结束时的计时信息位于 OUTCAR 的最后几十行
+TIMING_BYTES = 1 << 13
+
+BLOCK_SIZE = 1 << 16
+
+
+def reverse_lines(f, block_size=BLOCK_SIZE):
+    """
+    从文件末尾开始按块向前读取，逐行（倒序）返回 bytes。
+    """
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    remainder = b""
+    while position > 0:
+        size = min(block_size, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + remainder).split(b"\n")
+        # 第一段可能是不完整的行，留到下一块拼接
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            yield line
+    yield remainder
+
+
+def read_outcar(path, block_size=BLOCK_SIZE):
+    """
+    倒序扫描 OUTCAR，一次读取得到最终能量、收敛标志与离子步数，不调用外部命令。
+    读到最后一个离子步的 Iteration 行即停止，通常只需读取文件末尾的几十 KB。
+
+    :param path: OUTCAR 文件路径
+    :return: OutcarSummary；对应信息不存在时 energy / ionic_steps 为 None
+    """
+    energy = None
+    ionic_steps = None
+    required_accuracy = False
+    total_cpu_time = False
+    with open(path, "rb") as f:
+        for line in reverse_lines(f, block_size):
+            if ionic_steps is None:
+                # 收敛标志只会出现在最后一个 Iteration 行之后
+                if not total_cpu_time and b"Total CPU time" in line:
+                    total_cpu_time = True
+                elif not required_accuracy and b"required accuracy" in line:
+                    required_accuracy = True
+            if energy is None and b"  without" in line:
+                match = ENERGY_PATTERN.search(line)
+                if match:
+                    energy = float(match.group(1))
+                else:
+                    fields = line.split()
+                    energy = float(fields[6]) if len(fields) > 6 else None
+            if ionic_steps is None and b"Iteration" in line:
+                match = ITERATION_PATTERN.search(line)
+                if match:
+                    ionic_steps = int(match.group(1))
+            if energy is not None and ionic_steps is not None:
+                break
+    return OutcarSummary(energy, required_accuracy, total_cpu_time, ionic_steps)
+
+
+def final_energy(path):
+    """
+    返回 OUTCAR 中最后的 energy(sigma->0)，找不到时抛出 ValueError。
+    """
+    energy = read_outcar(path).energy
+    if energy is None:
+        raise ValueError(f"No energy found in {path}")
+    return energy
+
+
+def elapsed_time(path, size=TIMING_BYTES):
+    """
+    返回 OUTCAR 末尾 'Elapsed time (sec):' 给出的 VASP 运行时间（秒）；作业中途结束时没有该行，返回 None。
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - size))
+        match = ELAPSED_PATTERN.search(f.read())
+    return float(match.group(1)) if match else None
+
+
+if __name__ == "__main__":
+    # 用法: python outcar.py [OUTCAR] [--all]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    summary = read_outcar(args[0] if args else "OUTCAR")
+    if "--all" in sys.argv:
+        for field, value in summary._asdict().items():
+            print(f"{field}\t{value}")
+    elif summary.energy is not None:
+        print(summary.energy)
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import hashlib
+
+from outcar import read_outcar, OutcarSummary
+from results import RESULTS_DB
+
+# 以 OUTCAR 路径 + 大小 + 修改时间（可选末尾内容哈希）为指纹，缓存解析结果与 Gcorr
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcar_cache (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    tail_hash   TEXT,
+    energy      REAL,
+    required_accuracy INTEGER,
+    total_cpu_time    INTEGER,
+    ionic_steps INTEGER,
+    gcorr       REAL
+);
+"""
+
+TAIL_BYTES = 4096
+
+
+def tail_hash(path, size=TAIL_BYTES):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - size))
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class OutcarCache:
+    """
+    OUTCAR 解析结果缓存：文件未变化时直接返回缓存，流程重启时无需重新扫描 OUTCAR 或重新运行 vaspkit。
+
+    :param path: 缓存数据库路径，默认与结果库共用
+    :param check_tail: 是否额外比较文件末尾内容的哈希（用于 mtime 不可靠的文件系统）
+    """
+
+    def __init__(self, path=RESULTS_DB, check_tail=False):
+        self.path = os.path.abspath(path)
+        self.check_tail = check_tail
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _fingerprint(self, path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns, tail_hash(path) if self.check_tail else None
+
+    def _lookup(self, path):
+        """
+        返回 (缓存行或 None, 当前指纹)。指纹不匹配时缓存行为 None。
+        """
+        fingerprint = self._fingerprint(path)
+        row = self.conn.execute("SELECT * FROM outcar_cache WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        if row and (row["size"], row["mtime_ns"]) == fingerprint[:2] and \
+                (not self.check_tail or row["tail_hash"] == fingerprint[2]):
+            return row, fingerprint
+        return None, fingerprint
+
+    def summary(self, path):
+        """
+        返回 OUTCAR 的 OutcarSummary，文件未变化时不读取文件内容。
+        """
+        row, fingerprint = self._lookup(path)
+        if row:
+            self.hits += 1
+            return OutcarSummary(row["energy"], bool(row["required_accuracy"]), bool(row["total_cpu_time"]),
+                                 row["ionic_steps"])
+        self.misses += 1
+        summary = read_outcar(path)
+        with self.conn:
+            # 文件变化后旧的 Gcorr 一并失效
+            self.conn.execute(
+                "INSERT OR REPLACE INTO outcar_cache (path, size, mtime_ns, tail_hash, energy, required_accuracy, "
+                "total_cpu_time, ionic_steps, gcorr) VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                (os.path.abspath(path),) + fingerprint + (summary.energy, int(summary.required_accuracy),
+                                                          int(summary.total_cpu_time), summary.ionic_steps))
+        return summary
+
+    def gcorr(self, path, compute):
+        """
+        返回 thermal OUTCAR 对应的 Gcorr；缓存失效时调用 compute() 计算并写入缓存。
+        """
+        path = os.path.abspath(path)
+        self.summary(path)
+        row = self.conn.execute("SELECT gcorr FROM outcar_cache WHERE path = ?", (path,)).fetchone()
+        if row["gcorr"] is not None:
+            return row["gcorr"]
+        value = compute()
+        with self.conn:
+            self.conn.execute("UPDATE outcar_cache SET gcorr = ? WHERE path = ?", (value, path))
+        return value
+
+    def evict_missing(self):
+        """
+        删除对应 OUTCAR 已不存在（如目录被删除）的缓存条目。
+
+        :return: 删除的条目数
+        """
+        missing = [row["path"] for row in self.conn.execute("SELECT path FROM outcar_cache")
+                   if not os.path.isfile(row["path"])]
+        with self.conn:
+            self.conn.executemany("DELETE FROM outcar_cache WHERE path = ?", [(path,) for path in missing])
+        return len(missing)
@@ -0,0 +1,215 @@
+#!/public23/home/a21000011/conda_envs/pymatgen_env/bin/python
+import os
+import sys
+import datetime
+import importlib
+import warnings
+
+import numpy as np
+
+warnings.simplefilter("ignore")
+
+# 提交 VASP 之前的吸附构型预筛选（默认关闭）：NETCHG_PRESCREEN=1 或筛选清单中 prescreen: true 时启用
+PRESCREEN = os.environ.get("NETCHG_PRESCREEN", "0") == "1"
+# 本地离线计算器："emt" 为 ASE 的 EMT，或 "模块:函数"（返回 ASE calculator 的无参函数，如用户的力场）
+CALCULATOR = os.environ.get("NETCHG_PRESCREEN_CALCULATOR", "emt")
+
+# 候选构型：吸附物第一个原子距位点的高度（Å）× 绕 x 轴的倾斜角 × 绕表面法向的转角
+HEIGHTS = (1.6, 2.0, 2.4, 2.8)
+TILTS = (0, 90, 180)
+ROTATIONS = 6  # 绕表面法向均分 360°
+# 两原子距离小于 CLASH_FACTOR ×（共价半径之和）视为重叠
+CLASH_FACTOR = 0.6
+# 预优化：只有吸附物原子移动，基底固定
+PRERELAX_FMAX = 0.1  # eV/Å
+PRERELAX_STEPS = 100
+
+
+def log_info(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] INFO: {message}")
+
+
+def log_error(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ERROR: {message}", file=sys.stderr)
+
+
+def load_calculator(spec=None):
+    """
+    按 CALCULATOR 构造 ASE calculator，ASE 或力场不可用时返回 None（只按重叠检查排序）。
+    """
+    spec = spec or CALCULATOR
+    try:
+        if spec.lower() == "emt":
+            from ase.calculators.emt import EMT
+            return EMT()
+        module_name, function_name = spec.split(":")
+        return getattr(importlib.import_module(module_name), function_name)()
+    except Exception as e:
+        log_error(f"Pre-screening calculator {spec} is unavailable ({e}); ranking by clash check only.")
+        return None
+
+
+def rotation_matrix(tilt, rotation):
+    """
+    先绕 x 轴倾斜 tilt 度，再绕 z 轴（表面法向）转 rotation 度。
+    """
+    t, r = np.radians(tilt), np.radians(rotation)
+    tilt_x = np.array([[1, 0, 0], [0, np.cos(t), -np.sin(t)], [0, np.sin(t), np.cos(t)]])
+    rotate_z = np.array([[np.cos(r), -np.sin(r), 0], [np.sin(r), np.cos(r), 0], [0, 0, 1]])
+    return rotate_z @ tilt_x
+
+
+def orientations(molecule, tilts=TILTS, rotations=ROTATIONS):
+    """
+    吸附物相对第一个原子的坐标在各取向下的结果，单原子吸附物只有一个取向。
+
+    :return: [(倾斜角, 转角, 相对坐标数组), ...]
+    """
+    relative = np.array(molecule.cart_coords) - molecule.cart_coords[0]
+    if len(molecule) == 1:
+        return [(0, 0, relative)]
+    return [(tilt, rotation, relative @ rotation_matrix(tilt, rotation).T)
+            for tilt in tilts for rotation in np.arange(rotations) * 360 / rotations]
+
+
+def covalent_radii(species):
+    from pymatgen.analysis.molecule_structure_comparator import CovalentRadius
+
+    return np.array([CovalentRadius.radius.get(str(s), 1.5) for s in species])
+
+
+def clash_margin(lattice, substrate_frac, substrate_radii, coords, radii):
+    """
+    吸附物原子与基底原子（考虑周期性）的最小 距离 /（共价半径之和），小于 CLASH_FACTOR 即为重叠。
+    """
+    distances = lattice.get_all_distances(lattice.get_fractional_coords(coords), substrate_frac)
+    return float(np.min(distances / (radii[:, None] + substrate_radii[None, :])))
+
+
+def rank_placements(structure, molecule, site_coords, heights=HEIGHTS, calculator=None):
+    """
+    枚举 取向 × 高度 的候选构型，去掉与基底重叠的构型，其余按计算器给出的能量（计算器不可用时按重叠余量）排序。
+
+    :param structure: 基底结构（不修改）
+    :param molecule: 吸附物分子（不修改）
+    :param site_coords: 位点的笛卡尔坐标
+    :param calculator: ASE calculator，None 时只做重叠检查
+    :return: [{"tilt", "rotation", "height", "margin", "energy", "coords"}, ...]，最好的在前；全部重叠时为空
+    """
+    lattice = structure.lattice
+    substrate_frac = structure.frac_coords
+    substrate_radii = covalent_radii(structure.species)
+    radii = covalent_radii(molecule.species)
+    base = None
+    if calculator is not None:
+        from pymatgen.io.ase import AseAtomsAdaptor
+        base = AseAtomsAdaptor.get_atoms(structure)
+        symbols = [str(s) for s in molecule.species]
+
+    candidates = []
+    for tilt, rotation, relative in orientations(molecule):
+        for height in heights:
+            coords = relative + np.array(site_coords) + [0, 0, height]
+            margin = clash_margin(lattice, substrate_frac, substrate_radii, coords, radii)
+            if margin < CLASH_FACTOR:
+                continue
+            candidates.append({"tilt": tilt, "rotation": float(rotation), "height": height, "margin": margin,
+                               "energy": None, "coords": coords})
+
+    if base is not None:
+        from ase import Atoms
+        try:
+            for candidate in candidates:
+                atoms = base + Atoms(symbols, positions=candidate["coords"])
+                atoms.calc = calculator
+                candidate["energy"] = float(atoms.get_potential_energy())
+        except Exception as e:
+            log_error(f"Pre-screening calculator failed ({e}); ranking by clash check only.")
+            for candidate in candidates:
+                candidate["energy"] = None
+    if candidates and candidates[0]["energy"] is not None:
+        candidates.sort(key=lambda c: c["energy"])
+    else:
+        # 没有能量时：重叠余量大者优先，相同时高度低者优先
+        candidates.sort(key=lambda c: (-round(c["margin"], 2), c["height"]))
+    return candidates
+
+
+def best_placement(structure, molecule, site_coords, heights=HEIGHTS, calculator=None):
+    """
+    选出最好的候选构型：返回转到该取向的吸附物与高度，可直接交给 adsorbate.place_adsorbate。
+    所有候选构型都与基底重叠时抛出 ValueError，不生成注定失败的计算。
+
+    :return: (Molecule, height)
+    """
+    candidates = rank_placements(structure, molecule, site_coords, heights, calculator)
+    if not candidates:
+        raise ValueError(f"every orientation of the adsorbate at heights {list(heights)} Å clashes with the "
+                         f"substrate (closer than {CLASH_FACTOR} x covalent radii); placement dropped")
+    best = candidates[0]
+    energy = f", E = {best['energy']:.3f} eV" if best["energy"] is not None else ""
+    log_info(f"Pre-screening kept {len(candidates)} placement(s); best: tilt {best['tilt']}°, rotation "
+             f"{best['rotation']:.0f}°, height {best['height']} Å{energy}.")
+    from pymatgen.core import Molecule
+
+    return Molecule(molecule.species, best["coords"] - best["coords"][0]), best["height"]
+
+
+def prerelax(structure, calculator, fmax=PRERELAX_FMAX, steps=PRERELAX_STEPS):
+    """
+    用本地计算器预优化吸附物（基底原子固定），原地修改 structure 中吸附物原子的坐标。
+    优化后与基底重叠时保留原构型。
+
+    :param structure: 带 surface_properties 的吸附结构
+    :return: 吸附物原子移动的最大距离（Å），计算器不可用或失败时为 None
+    """
+    if calculator is None:
+        return None
+    from ase.constraints import FixAtoms
+    from ase.optimize import BFGS
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    groups = structure.site_properties["surface_properties"]
+    adsorbate = [i for i, group in enumerate(groups) if group == "adsorbate"]
+    atoms = AseAtomsAdaptor.get_atoms(structure)
+    atoms.set_constraint(FixAtoms(indices=[i for i, group in enumerate(groups) if group != "adsorbate"]))
+    atoms.calc = calculator
+    try:
+        BFGS(atoms, logfile=None).run(fmax=fmax, steps=steps)
+    except Exception as e:
+        log_error(f"Pre-relaxation failed ({e}); keeping the unrelaxed placement.")
+        return None
+
+    shifts = atoms.positions[adsorbate] - structure.cart_coords[adsorbate]
+    substrate = [i for i in range(len(structure)) if i not in set(adsorbate)]
+    margin = clash_margin(structure.lattice, structure.frac_coords[substrate],
+                          covalent_radii([structure[i].specie for i in substrate]),
+                          atoms.positions[adsorbate], covalent_radii([structure[i].specie for i in adsorbate]))
+    if margin < CLASH_FACTOR:
+        log_error("Pre-relaxed adsorbate clashes with the substrate; keeping the unrelaxed placement.")
+        return None
+    for index, shift in zip(adsorbate, shifts):
+        structure.translate_sites([index], shift, frac_coords=False, to_unit_cell=False)
+    moved = float(np.max(np.linalg.norm(shifts, axis=1)))
+    log_info(f"Pre-relaxed the adsorbate: atoms moved up to {moved:.2f} Å.")
+    return moved
+
+
+if __name__ == "__main__":
+    # 用法: python prescreen.py <support> <adsorbate> <site_index> [num_top_layers]
+    #   打印候选构型的排序（重叠的构型已去掉），不生成计算目录
+    from pymatgen.core import Molecule, Structure
+    from sites import site_position
+    from slab import label_surface, NUM_TOP_LAYERS
+
+    support_name, adsorbate_name, site_index = sys.argv[1:4]
+    structure = Structure.from_file(os.path.join('.', support_name, 'CONTCAR'))
+    label_surface(structure, int(sys.argv[4]) if len(sys.argv) > 4 else NUM_TOP_LAYERS)
+    molecule = Molecule.from_file(os.path.join('.', adsorbate_name + '.xyz'))
+    candidates = rank_placements(structure, molecule, site_position(structure, support_name, site_index),
+                                 calculator=load_calculator())
+    for candidate in candidates:
+        energy = f"{candidate['energy']:.3f}" if candidate["energy"] is not None else "-"
+        print(f"tilt {candidate['tilt']:>3}\trotation {candidate['rotation']:>5.0f}\theight {candidate['height']}\t"
+              f"margin {candidate['margin']:.2f}\tE {energy}")
+    print(f"{len(candidates)} placement(s) without clashes")
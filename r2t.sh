@@ -17,7 +17,7 @@ elif [ -f "1-contcar/CONTCAR-$1" ]; then
     rm -rf "$dir"
   fi
   mkdir -p "$dir"
-  cp "$1/"{INCAR,POTCAR,KPOINTS} "$dir"
+  for f in INCAR POTCAR KPOINTS; do cp "$1/$f" "$dir"; done
   cp "$1/CONTCAR" "${dir}/POSCAR"
 
 # edit files for thermal!
@@ -0,0 +1,215 @@
+import os
+import re
+import sys
+import glob
+from collections import namedtuple
+
+from outcar import read_outcar
+
+# 计算中止的原因
+WALLTIME = "walltime"      # 作业达到 SLURM 时间上限被终止
+NSW_EXHAUSTED = "nsw"      # 离子步用完 NSW 仍未达到 EDIFFG
+SCF = "scf"                # 电子步达到 NELM 仍未收敛
+ZBRENT = "zbrent"          # 共轭梯度线搜索失败（ZBRENT: fatal error in bracketing）
+CRASH = "crash"            # 其他原因（原样重新提交）
+
+# 中止原因与依据，如 Diagnosis("scf", "ionic step 12 used 200 of NELM = 200 electronic steps")
+Diagnosis = namedtuple("Diagnosis", ["reason", "detail"])
+
+# 重启策略参数
+NSW_FACTOR = 1.5     # NSW 用完时放大的倍数
+MAX_NSW = 1000       # NSW 的上限
+POTIM_FACTOR = 0.5   # ZBRENT 错误时 POTIM 的缩小倍数
+MIN_POTIM = 0.05     # POTIM 的下限
+# SCF 不收敛时依次更换的 ALGO（最后一个不再更换）
+ALGO_FALLBACK = {"VERYFAST": "Normal", "FAST": "Normal", "NORMAL": "All", "ALL": "Damped"}
+# 优化算法（IBRION=5/6/7/8 为振动计算，其 POTIM 是位移步长，不做调整）
+RELAX_IBRION = ("1", "2", "3")
+
+# SLURM 在作业输出中写出的时间上限提示，如 "*** JOB 123 ON cn01 CANCELLED AT ... DUE TO TIME LIMIT ***"
+TIME_LIMIT_PATTERN = re.compile(rb"DUE TO TIME LIMIT")
+ZBRENT_PATTERN = re.compile(rb"ZBRENT: fatal error")
+# OSZICAR 中的电子步行（如 "DAV:  12 ..."）与离子步结束行（含 "F="）
+ELECTRONIC_STEP_PATTERN = re.compile(r"^\s*(DAV|RMM|CG|CGA|SDA|EDD|DIA):")
+INCAR_LINE_PATTERN = re.compile(r"^\s*(\w+)\s*=\s*([^!#\n]*)")
+
+# 只读取作业输出末尾，其中包含 VASP 的报错与 SLURM 的终止原因
+OUTPUT_TAIL_BYTES = 1 << 16
+
+
+def read_incar(path):
+    """
+    读取 INCAR 中的参数，返回 {参数名（大写）: 字符串值}。
+    """
+    incar = {}
+    with open(path) as f:
+        for line in f:
+            match = INCAR_LINE_PATTERN.match(line)
+            if match:
+                incar[match.group(1).upper()] = match.group(2).strip()
+    return incar
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return ".TRUE." if value else ".FALSE."
+    return str(value)
+
+
+def update_incar(path, settings):
+    """
+    修改 INCAR 中的参数：已有的参数行原地替换，其余追加到末尾，注释与其他参数保持不变。
+    """
+    with open(path) as f:
+        lines = f.readlines()
+    remaining = {key.upper(): value for key, value in settings.items()}
+    for i, line in enumerate(lines):
+        match = INCAR_LINE_PATTERN.match(line)
+        if match and match.group(1).upper() in remaining:
+            key = match.group(1).upper()
+            lines[i] = f"{key} = {format_value(remaining.pop(key))}\n"
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    lines.extend(f"{key} = {format_value(value)}\n" for key, value in remaining.items())
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+def _number(incar, key, default):
+    try:
+        return float(incar[key].split()[0])
+    except (KeyError, ValueError, IndexError):
+        return default
+
+
+def latest_job_output(directory):
+    """
+    目录中最新的 slurm-*.out 的末尾内容（bytes），没有时返回 b""。
+    """
+    outputs = glob.glob(os.path.join(directory, "slurm-*.out"))
+    if not outputs:
+        return b""
+    with open(max(outputs, key=os.path.getmtime), "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - OUTPUT_TAIL_BYTES))
+        return f.read()
+
+
+def electronic_steps(oszicar_path):
+    """
+    OSZICAR 中每个离子步的电子步数；最后一项可能是被中断的离子步。
+    """
+    steps = [0]
+    with open(oszicar_path) as f:
+        for line in f:
+            if ELECTRONIC_STEP_PATTERN.match(line):
+                steps[-1] += 1
+            elif "F=" in line:
+                steps.append(0)
+    if steps[-1] == 0:
+        steps.pop()
+    return steps
+
+
+def classify(directory):
+    """
+    由 OUTCAR、OSZICAR、INCAR 与最新的作业输出判断计算中止的原因。
+
+    :param directory: 计算目录
+    :return: Diagnosis
+    """
+    incar_path = os.path.join(directory, "INCAR")
+    incar = read_incar(incar_path) if os.path.isfile(incar_path) else {}
+    output = latest_job_output(directory)
+    if ZBRENT_PATTERN.search(output):
+        return Diagnosis(ZBRENT, "ZBRENT: fatal error in bracketing")
+    if TIME_LIMIT_PATTERN.search(output):
+        return Diagnosis(WALLTIME, "job was cancelled at the time limit")
+
+    oszicar = os.path.join(directory, "OSZICAR")
+    steps = electronic_steps(oszicar) if os.path.isfile(oszicar) else []
+    nelm = int(_number(incar, "NELM", 60))
+    if steps and steps[-1] >= nelm:
+        return Diagnosis(SCF, f"ionic step {len(steps)} used {steps[-1]} of NELM = {nelm} electronic steps")
+
+    outcar = os.path.join(directory, "OUTCAR")
+    summary = read_outcar(outcar) if os.path.isfile(outcar) else None
+    nsw = int(_number(incar, "NSW", 0))
+    if summary and summary.total_cpu_time and not summary.required_accuracy and \
+            summary.ionic_steps is not None and nsw and summary.ionic_steps >= nsw:
+        return Diagnosis(NSW_EXHAUSTED, f"{summary.ionic_steps} ionic steps reached NSW = {nsw}")
+    if summary and not summary.total_cpu_time and summary.ionic_steps:
+        # OUTCAR 中途截断且没有报错：通常是作业被调度系统终止
+        return Diagnosis(WALLTIME, f"OUTCAR stops after {summary.ionic_steps} ionic steps without an error")
+    return Diagnosis(CRASH, "no known cause in OUTCAR/OSZICAR/job output")
+
+
+def plan_restart(diagnosis, incar, directory="."):
+    """
+    根据中止原因给出重启时需要修改的 INCAR 参数。
+
+    - 时间上限：打开 LWAVE 保留波函数，已有 WAVECAR 时以 ISTART = 1 读入
+    - NSW 用完：NSW 放大 NSW_FACTOR 倍（不超过 MAX_NSW），并保留波函数
+    - SCF 不收敛：按 ALGO_FALLBACK 更换 ALGO，丢弃可能已发散的波函数
+    - ZBRENT：POTIM 缩小 POTIM_FACTOR 倍（不低于 MIN_POTIM）
+    - 其他：不修改
+
+    :param diagnosis: classify 的结果
+    :param incar: read_incar 的结果
+    :param directory: 计算目录，用于检查 WAVECAR
+    :return: {参数名: 新值}
+    """
+    wavecar = os.path.join(directory, "WAVECAR")
+    keep_wavefunction = {"LWAVE": True}
+    if os.path.isfile(wavecar) and os.path.getsize(wavecar) > 0:
+        keep_wavefunction["ISTART"] = 1
+    relaxation = (incar.get("IBRION") or "2").split()[0] in RELAX_IBRION
+
+    if diagnosis.reason == WALLTIME:
+        return keep_wavefunction
+    if diagnosis.reason == NSW_EXHAUSTED and relaxation:
+        nsw = int(_number(incar, "NSW", 0))
+        settings = dict(keep_wavefunction)
+        if nsw < MAX_NSW:
+            settings["NSW"] = min(MAX_NSW, int(nsw * NSW_FACTOR))
+        return settings
+    if diagnosis.reason == SCF:
+        algo = incar.get("ALGO", "Normal").split()[0].upper()
+        settings = {"ISTART": 0}
+        if algo in ALGO_FALLBACK:
+            settings["ALGO"] = ALGO_FALLBACK[algo]
+        return settings
+    if diagnosis.reason == ZBRENT and relaxation:
+        potim = _number(incar, "POTIM", 0.5)
+        return {"POTIM": round(max(MIN_POTIM, potim * POTIM_FACTOR), 3)} if potim > MIN_POTIM else {}
+    return {}
+
+
+def apply_restart(directory):
+    """
+    判断计算中止的原因并修改 INCAR，应在 backup.sh 将 CONTCAR 复制为 POSCAR 之后、重新提交之前调用。
+
+    :return: (Diagnosis, 修改的参数)
+    """
+    incar_path = os.path.join(directory, "INCAR")
+    diagnosis = classify(directory)
+    if not os.path.isfile(incar_path):
+        return diagnosis, {}
+    settings = plan_restart(diagnosis, read_incar(incar_path), directory)
+    if settings:
+        update_incar(incar_path, settings)
+    return diagnosis, settings
+
+
+if __name__ == "__main__":
+    # 用法: python restart.py <计算目录> [--apply]    打印中止原因与重启策略，--apply 时修改 INCAR
+    directory = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith("--") else "."
+    if "--apply" in sys.argv:
+        diagnosis, settings = apply_restart(directory)
+    else:
+        diagnosis = classify(directory)
+        incar_path = os.path.join(directory, "INCAR")
+        settings = plan_restart(diagnosis, read_incar(incar_path) if os.path.isfile(incar_path) else {}, directory)
+    print(f"{diagnosis.reason}\t{diagnosis.detail}")
+    for key, value in settings.items():
+        print(f"{key} = {format_value(value)}")
@@ -0,0 +1,173 @@
+import os
+import sys
+import csv
+import json
+import sqlite3
+import datetime
+
+# 结果数据库默认位于项目根目录（flow 在 Support 目录下运行）；导入时即转为绝对路径，
+# 之后切换工作目录也不会把结果分散到不同的数据库文件
+RESULTS_DB = os.path.abspath(os.environ.get("NETCHG_RESULTS_DB", os.path.join("..", "results.db")))
+
+# 主键：(material, adsorbate, site, charge, stage)；slab 等与吸附物/位点无关的记录使用空字符串
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    material  TEXT NOT NULL,
+    adsorbate TEXT NOT NULL DEFAULT '',
+    site      TEXT NOT NULL DEFAULT '',
+    charge    INTEGER NOT NULL DEFAULT 0,
+    stage     TEXT NOT NULL,
+    name      TEXT,
+    energy    REAL,
+    gcorr     REAL,
+    eads      REAL,
+    metadata  TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (material, adsorbate, site, charge, stage)
+);
+CREATE INDEX IF NOT EXISTS idx_results_stage ON results (stage, adsorbate);
+CREATE INDEX IF NOT EXISTS idx_results_name ON results (name);
+"""
+
+VALUE_COLUMNS = ("name", "energy", "gcorr", "eads", "metadata")
+
+
+class ResultStore:
+    """
+    SQLite 结果库，替代 Edft.txt / Gcorr.txt / Eads.csv 的追加写入。
+    每次写入都是一个事务内的 upsert，多个流程同时写入不会互相覆盖。
+
+    :param path: 数据库文件路径
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = os.path.abspath(path)
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def upsert(self, material, stage, adsorbate="", site="", charge=0, **values):
+        """
+        写入或更新一条记录，只覆盖传入的字段。
+
+        :param values: name / energy / gcorr / eads / metadata（dict 会被序列化为 JSON）
+        """
+        unknown = set(values) - set(VALUE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown result fields: {', '.join(sorted(unknown))}")
+        if isinstance(values.get("metadata"), dict):
+            values["metadata"] = json.dumps(values["metadata"], sort_keys=True)
+        values["updated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        key = {"material": material, "adsorbate": adsorbate or "", "site": str(site if site is not None else ""),
+               "charge": int(charge), "stage": stage}
+        columns = list(key) + list(values)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        sql = (f"INSERT INTO results ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+               f"ON CONFLICT (material, adsorbate, site, charge, stage) DO UPDATE SET {updates}")
+        with self.conn:
+            self.conn.execute(sql, list(key.values()) + list(values.values()))
+
+    def get(self, material, stage, adsorbate="", site="", charge=0):
+        row = self.conn.execute(
+            "SELECT * FROM results WHERE material = ? AND adsorbate = ? AND site = ? AND charge = ? AND stage = ?",
+            (material, adsorbate or "", str(site if site is not None else ""), int(charge), stage)).fetchone()
+        return dict(row) if row else None
+
+    def query(self, **filters):
+        """
+        按字段筛选记录，例如 query(stage="binding", adsorbate="OH")。
+        """
+        unknown = set(filters) - {"material", "adsorbate", "site", "charge", "stage", "name"}
+        if unknown:
+            raise ValueError(f"Unknown result fields: {', '.join(sorted(unknown))}")
+        where = " AND ".join(f"{column} = ?" for column in filters) or "1"
+        rows = self.conn.execute(f"SELECT * FROM results WHERE {where} ORDER BY material, adsorbate, site, charge",
+                                 list(filters.values()))
+        return [dict(row) for row in rows]
+
+    def export_text(self, support_dir=".", project_dir=".."):
+        """
+        由数据库重新生成 ORR_G.py 使用的文本文件（整体重写，不再追加）：
+          {support_dir}/Edft.txt、{project_dir}/{ads}/Edft.txt、{project_dir}/{ads}/2-thermal/Gcorr.txt、
+          {support_dir}/Eads.csv
+        Edft.txt / Gcorr.txt 中数据库没有的条目（如手动运行 getE.sh 得到的）会被保留。
+        """
+        files = {}
+        for row in self.query(stage="slab"):
+            files.setdefault(os.path.join(support_dir, "Edft.txt"), []).append((row["name"] or row["material"],
+                                                                                row["energy"]))
+        for row in self.query(stage="ads"):
+            path = os.path.join(project_dir, row["adsorbate"], "Edft.txt")
+            files.setdefault(path, []).append((row["name"], row["energy"]))
+        for row in self.query(stage="thermal"):
+            path = os.path.join(project_dir, row["adsorbate"], "2-thermal", "Gcorr.txt")
+            files.setdefault(path, []).append((row["name"], row["gcorr"]))
+        for path, entries in files.items():
+            if not os.path.isdir(os.path.dirname(path) or "."):
+                continue
+            merged = _read_text(path)
+            merged.update((name, str(value)) for name, value in entries if value is not None)
+            _write_atomic(path, "".join(f"{name}\t{value}\n" for name, value in merged.items()))
+
+        rows = self.query(stage="binding")
+        if rows:
+            path = os.path.join(support_dir, "Eads.csv")
+            with open(path + ".tmp", "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["adsorbate_name", "support_name", "site", "net_charge", "Emolecule", "Esupport",
+                                 "Eadsorbate", "Efar_adsorbate", "Eads"])
+                for row in rows:
+                    meta = json.loads(row["metadata"] or "{}")
+                    writer.writerow([row["adsorbate"], row["name"] or row["material"], row["site"], row["charge"]] +
+                                    [_fmt(meta.get(column)) for column in
+                                     ("Emolecule", "Esupport", "Eadsorbate", "Efar_adsorbate")] +
+                                    [_fmt(row["eads"])])
+            os.replace(path + ".tmp", path)
+
+
+def _fmt(value):
+    return "" if value is None else f"{value:.2f}"
+
+
+def _read_text(path):
+    entries = {}
+    if os.path.isfile(path):
+        with open(path) as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if fields[0]:
+                    entries[fields[0]] = "\t".join(fields[1:])
+    return entries
+
+
+def _write_atomic(path, text):
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    # 用法: python results.py export            由数据库重新生成 Edft.txt / Gcorr.txt / Eads.csv
+    #       python results.py show [stage]      打印数据库中的记录
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    store = ResultStore()
+    if command == "export":
+        store.export_text()
+        print(f"Exported results from {store.path}")
+    else:
+        filters = {"stage": sys.argv[2]} if len(sys.argv) > 2 else {}
+        for row in store.query(**filters):
+            print("\t".join("" if row[c] is None else str(row[c]) for c in
+                            ("material", "adsorbate", "site", "charge", "stage", "name", "energy", "gcorr", "eads")))
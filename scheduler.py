@@ -0,0 +1,274 @@
+import os
+import re
+import sys
+import glob
+import subprocess
+import time
+import itertools
+import threading
+from collections import deque
+
+from job_array import format_indices
+from slurm_poller import JobPoller, SlurmPoller, log_info, log_error
+
+# 单个目录的提交脚本（输出 "job <作业号>"）与 job array 提交脚本
+SUBMIT_SCRIPT = "gam-subvasp.sh"
+ARRAY_SCRIPT = "array-subvasp.sh"
+
+# 作业输出文件 slurm-<作业号>.out 或 slurm-<作业号>_<任务号>.out（job array）
+JOB_OUTPUT_PATTERN = re.compile(r'\d+(_\d+)?')
+
+# 本地后端的作业号以运行开始的时间（毫秒）× JOB_ID_BLOCK 起编，见 LocalScheduler
+JOB_ID_BLOCK = 1000
+
+
+class Scheduler(JobPoller):
+    """
+    调度后端的公共部分：记录每个目录最近一次提交的作业号，并以批量队列查询作业状态（见 JobPoller）。
+    具体后端实现 submit、submit_array 与 _squeue。
+
+    :param poller_options: 轮询参数
+    """
+
+    def __init__(self, **poller_options):
+        super().__init__(**poller_options)
+        self.submit_calls = 0
+        # 每个计算目录（绝对路径）最近一次提交的作业号
+        self.latest_jobs = {}
+        # 每个 job array 作业号提交的任务数
+        self.array_sizes = {}
+
+    def record_submission(self, directory, job_id):
+        """
+        记录目录最近一次提交的作业号；之后的状态检查只查看该作业。
+        """
+        self.latest_jobs[os.path.abspath(directory)] = str(job_id)
+        self.note_submission(job_id)
+
+    def submit(self, directory):
+        """
+        提交一个计算目录，返回作业号；提交失败时返回 None。
+        """
+        raise NotImplementedError
+
+    def submit_array(self, list_file, indices=None):
+        """
+        以 job array 提交目录列表文件中的全部（或给定下标的）目录，返回 job array 的作业号。
+        """
+        raise NotImplementedError
+
+    def _record_array(self, list_file, indices, job_id):
+        with open(list_file) as f:
+            directories = [line.strip() for line in f if line.strip()]
+        base = os.path.dirname(os.path.abspath(list_file))
+        indices = range(len(directories)) if indices is None else sorted(set(indices))
+        for index in indices:
+            self.record_submission(os.path.join(base, directories[index]), f"{job_id}_{index}")
+        self.array_sizes[str(job_id)] = len(indices)
+        self.note_submission(job_id)
+
+    def tasks(self, job_id):
+        return self.array_sizes.get(str(job_id), 1)
+
+    def latest_job(self, directory):
+        """
+        目录最近一次提交的作业号：优先取本进程的提交记录，否则取目录中作业号最大的 slurm-*.out
+        （之前各次提交留下的输出都已过期）。没有时返回 None。
+        """
+        job_id = self.latest_jobs.get(os.path.abspath(directory))
+        if job_id:
+            return job_id
+        job_ids = [JOB_OUTPUT_PATTERN.search(os.path.basename(file)).group()
+                   for file in glob.glob(os.path.join(directory, "slurm-*.out"))]
+        if not job_ids:
+            return None
+        return max(job_ids, key=lambda job_id: tuple(int(part) for part in job_id.split('_')))
+
+    def running_job(self, directory):
+        """
+        若目录最近一次提交的作业仍在队列中，返回其作业号，否则返回 None。
+        只查询这一个作业，状态取自本轮的批量队列查询结果。
+        """
+        job_id = self.latest_job(directory)
+        if job_id and self.is_active(job_id):
+            log_info(f"Job {job_id} for {directory} is currently running. Skipping job submission.")
+            return job_id
+        return None
+
+
+class SlurmScheduler(Scheduler, SlurmPoller):
+    """
+    SLURM 调度后端：以提交脚本提交单个目录或 job array，并以批量 squeue（可选 sacct）查询作业状态。
+
+    :param submit_script: 单个目录的提交脚本，参数为计算目录
+    :param array_script: job array 提交脚本，参数为目录列表文件与可选的任务下标
+    :param poller_options: SlurmPoller 的轮询参数
+    """
+
+    def __init__(self, submit_script=SUBMIT_SCRIPT, array_script=ARRAY_SCRIPT, **poller_options):
+        super().__init__(**poller_options)
+        self.submit_script = submit_script
+        self.array_script = array_script
+
+    def _submit(self, command):
+        self.submit_calls += 1
+        output = subprocess.check_output(command).decode()
+        match = re.search(r'job (\d+)', output)
+        if not match:
+            log_error(f"Error: Failed to find job ID in output: {output}")
+            return None
+        return match.group(1)
+
+    def submit(self, directory):
+        job_id = self._submit([self.submit_script, directory])
+        if job_id:
+            self.record_submission(directory, job_id)
+        return job_id
+
+    def submit_array(self, list_file, indices=None):
+        command = [self.array_script, list_file]
+        if indices is not None:
+            command.append(format_indices(indices))
+        job_id = self._submit(command)
+        if job_id:
+            self._record_array(list_file, indices, job_id)
+        return job_id
+
+
+class LocalScheduler(Scheduler):
+    """
+    本地调度后端：在计算目录中运行用户给定的命令（如模拟 VASP 的脚本），最多同时运行 max_workers 个，
+    其余排队。作业输出写入 slurm-<作业号>.out，作业状态的轮询与 SLURM 后端共用同一套逻辑（见 JobPoller），
+    用于在单台机器上测试流程与大量作业时的调度吞吐量。
+
+    :param command: 在计算目录中执行的 shell 命令
+    :param max_workers: 同时运行的作业数上限
+    :param interval: 轮询间隔（秒）
+    """
+
+    def __init__(self, command, max_workers=4, interval=1, max_interval=5, backoff=1.5):
+        super().__init__(interval=interval, max_interval=max_interval, backoff=backoff)
+        self.command = command
+        self.max_workers = max_workers
+        self.queue = deque()
+        self.running = {}
+        self.returncodes = {}
+        # 作业号不从 1 起编：后一次运行的作业号总大于之前各次运行的（每毫秒的运行时间可提交 JOB_ID_BLOCK 个），
+        # 恢复的旧作业号（见 flow_state）与旧的 slurm-*.out 不会与新作业重复
+        self._ids = itertools.count(time.time_ns() // 10 ** 6 * JOB_ID_BLOCK + 1)
+        # 作业结束时由等待线程回收并立即启动排队的作业；队列与运行中的作业由锁保护
+        self._lock = threading.Lock()
+        self._reapers = {}
+
+    def _dispatch(self):
+        # 按提交顺序启动排队的作业（调用者持有锁）
+        while self.queue and len(self.running) < self.max_workers:
+            job_id, directory = self.queue.popleft()
+            output = open(os.path.join(directory, f"slurm-{job_id}.out"), "w")
+            process = subprocess.Popen(self.command, shell=True, cwd=directory, stdout=output,
+                                       stderr=subprocess.STDOUT)
+            self.running[job_id] = (process, output)
+            reaper = threading.Thread(target=self._reap, args=(job_id, process, output), daemon=True)
+            self._reapers[job_id] = reaper
+            reaper.start()
+
+    def _reap(self, job_id, process, output):
+        # 等待作业结束，回收后立即补上空出的位置，不必等到下一次轮询
+        process.wait()
+        with self._lock:
+            output.close()
+            self.returncodes[job_id] = process.returncode
+            self.running.pop(job_id, None)
+            self._reapers.pop(job_id, None)
+            self._dispatch()
+
+    def _enqueue(self, job_id, directory):
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"No such calculation directory: {directory}")
+        self.queue.append((job_id, os.path.abspath(directory)))
+
+    def submit(self, directory):
+        self.submit_calls += 1
+        job_id = str(next(self._ids))
+        with self._lock:
+            self._enqueue(job_id, directory)
+            self.record_submission(directory, job_id)
+            self._dispatch()
+        return job_id
+
+    def submit_array(self, list_file, indices=None):
+        self.submit_calls += 1
+        with open(list_file) as f:
+            directories = [line.strip() for line in f if line.strip()]
+        job_id = str(next(self._ids))
+        base = os.path.dirname(os.path.abspath(list_file))
+        with self._lock:
+            for index in range(len(directories)) if indices is None else sorted(set(indices)):
+                self._enqueue(f"{job_id}_{index}", os.path.join(base, directories[index]))
+            self._record_array(list_file, indices, job_id)
+            self._dispatch()
+        return job_id
+
+    def _squeue(self):
+        self.squeue_calls += 1
+        with self._lock:
+            queue = {job_id: "RUNNING" for job_id in self.running}
+            queue.update((job_id, "PENDING") for job_id, _ in self.queue)
+        for job_id in list(queue):
+            if '_' in job_id:
+                queue.setdefault(job_id.split('_')[0], "RUNNING")
+        return queue
+
+    def terminate(self):
+        """
+        终止所有运行中的作业并清空队列。
+        """
+        with self._lock:
+            self.queue.clear()
+            processes = [process for process, _ in self.running.values()]
+            reapers = list(self._reapers.values())
+        for process in processes:
+            process.terminate()
+        for reaper in reapers:
+            reaper.join()
+
+
+def make_scheduler(options=None):
+    """
+    由配置创建调度后端，例如：
+      {"type": "slurm", "interval": 60}
+      {"type": "local", "command": "python fake_vasp.py", "workers": 8}
+
+    :param options: 配置字典，None 时使用 SLURM
+    """
+    options = dict(options or {})
+    kind = options.pop("type", "slurm")
+    if kind == "local":
+        if not options.get("command"):
+            raise ValueError("The local scheduler needs a command to run in each calculation directory.")
+        return LocalScheduler(options["command"], max_workers=int(options.get("workers", 4)),
+                              interval=float(options.get("interval", 1)))
+    if kind == "slurm":
+        return SlurmScheduler(**options)
+    raise ValueError(f"Unknown scheduler type: {kind}")
+
+
+def scheduler_options_from_env(defaults=None):
+    """
+    由环境变量读取调度后端配置：
+      NETCHG_SCHEDULER=local、NETCHG_LOCAL_COMMAND="python fake_vasp.py"、NETCHG_LOCAL_WORKERS=8
+    """
+    options = dict(defaults or {})
+    if os.environ.get("NETCHG_SCHEDULER", "slurm") == "local":
+        options = {"type": "local", "command": os.environ.get("NETCHG_LOCAL_COMMAND", ""),
+                   "workers": os.environ.get("NETCHG_LOCAL_WORKERS", 4)}
+    return options
+
+
+if __name__ == "__main__":
+    # 用法: python scheduler.py "<command>" <dir1> [dir2 ...]    用本地后端运行命令并等待全部完成
+    scheduler = LocalScheduler(sys.argv[1], max_workers=os.cpu_count() or 1)
+    job_ids = [scheduler.submit(directory) for directory in sys.argv[2:]]
+    scheduler.wait(job_ids)
+    for directory, job_id in zip(sys.argv[2:], job_ids):
+        print(f"{directory}\t{job_id}\t{scheduler.returncodes.get(job_id)}")
@@ -0,0 +1,91 @@
+import sys
+import json
+
+from flow_jobs import site_flows, build_graph, log_info, log_error, RESULTS, OUTCAR_CACHE, TOP_LAYER, \
+    SCHEDULER, METRICS_FILE, PROMETHEUS_FILE, RETRY_BUDGETS, MAX_TOTAL_RETRIES, use_scheduler
+import flow_jobs
+from flow_metrics import FlowMetrics
+import prescreen
+from scheduler import make_scheduler
+
+# 筛选清单示例（YAML 或 JSON），需在 Support 目录下运行：
+#
+#   materials: [Fe, Co]
+#   adsorbates: [OH, O, OOH]
+#   sites: [12]                 # 或按材料指定：{Fe: [12, 15], Co: auto}；auto 为全部对称性独立位点（sites.py）
+#   charges: [0, -1]
+#   top_layer: 3
+#   max_in_flight: 200          # 同时在队列中的任务数上限（job array 按任务数计）
+#   poll_interval: 60           # squeue 初始轮询间隔（秒）
+#   job_arrays: true            # 同一轮调度中同阶段的提交打包为 SLURM job array
+#   scheduler:                  # 可选：本地进程池后端，在每个计算目录中运行给定命令（如模拟 VASP）
+#     type: local
+#     command: python fake_vasp.py
+#     workers: 8
+#   metrics_file: flow-metrics.jsonl       # 每个节点的排队 / 运行 / 依赖等待时间与重试次数（JSON lines）
+#   prometheus_file: /var/lib/node_exporter/netchg.prom   # 可选：Prometheus textfile
+#   retry_budgets: {slab: 2, ads: 2, far: 2, thermal: 1}  # 每个节点的重新提交次数，用完后隔离（flow_state.py --release 解除）
+#   max_total_retries: 50       # 本次运行中重新提交的总数上限
+#   thermal_mode: array         # 频率计算：serial（一个 IBRION = 5 作业）或 array（有限差分位移单点以 job array 并行，vibrations.py）
+#   prescreen: true             # 提交前用本地计算器（prescreen.py，默认 ASE EMT）筛选吸附构型并预优化
+
+
+def load_manifest(path):
+    with open(path) as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        import yaml
+        return yaml.safe_load(f)
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def expand_flows(manifest):
+    """
+    将 材料 × 位点 × 电荷 展开为 Flow 列表，每个 Flow 计算全部吸附物，见 flow_jobs.site_flows。
+    位点为 auto 时使用 sites.py 枚举的全部对称性独立位点。
+    """
+    adsorbates = _as_list(manifest['adsorbates'])
+    charges = _as_list(manifest.get('charges', 0))
+    top_layer = manifest.get('top_layer', TOP_LAYER)
+    sites = manifest['sites']
+    flows = []
+    for mat in _as_list(manifest['materials']):
+        mat_sites = _as_list(sites[mat] if isinstance(sites, dict) else sites)
+        flows.extend(site_flows(mat, adsorbates, mat_sites, charges, top_layer))
+    return flows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        log_error("Usage: python screen.py <manifest.yaml|manifest.json>")
+        exit(1)
+
+    manifest = load_manifest(sys.argv[1])
+    scheduler = use_scheduler(make_scheduler(manifest['scheduler'])) if 'scheduler' in manifest else SCHEDULER
+    if 'poll_interval' in manifest:
+        scheduler.interval = scheduler.current_interval = manifest['poll_interval']
+    RETRY_BUDGETS.update(manifest.get('retry_budgets', {}))
+    prescreen.PRESCREEN = manifest.get('prescreen', prescreen.PRESCREEN)
+    flow_jobs.THERMAL_MODE = manifest.get('thermal_mode', flow_jobs.THERMAL_MODE)
+    flows = expand_flows(manifest)
+    log_info(f"Screening {len(flows)} flow(s) in one process.")
+    metrics = FlowMetrics(manifest.get('metrics_file', METRICS_FILE) or None,
+                          manifest.get('prometheus_file', PROMETHEUS_FILE))
+    graph = build_graph(flows, scheduler, max_in_flight=manifest.get('max_in_flight'),
+                        use_job_arrays=manifest.get('job_arrays', True), metrics=metrics,
+                        retry_budget=manifest.get('max_total_retries', MAX_TOTAL_RETRIES))
+    # 清理已删除目录的 OUTCAR 缓存
+    OUTCAR_CACHE.evict_missing()
+    success = graph.run()
+    # 由结果库重新生成 Edft.txt / Gcorr.txt / Eads.csv，供 ORR_G.py 使用
+    RESULTS.export_text()
+    if success:
+        log_info("All screening tasks have been completed.")
+    else:
+        log_error("Some screening tasks did not complete. See the log above for details.")
+        exit(1)
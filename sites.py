@@ -0,0 +1,122 @@
+#!/public23/home/a21000011/conda_envs/pymatgen_env/bin/python
+import os
+import sys
+import json
+import warnings
+
+from slab import label_surface
+
+warnings.simplefilter("ignore")
+
+# 枚举的吸附位点类型（AdsorbateSiteFinder 的 positions）
+SITE_POSITIONS = ("ontop", "bridge", "hollow")
+# 定义位点的表面原子层数：只由最上层原子构成 top / bridge / hollow 位点
+SITE_LAYERS = 1
+# 对称性约化与近邻去重的阈值（Å），与 AdsorbateSiteFinder 的默认值一致
+SYMM_REDUCE = 1e-2
+NEAR_REDUCE = 1e-2
+# 枚举结果的保存位置（相对于 flow 的运行目录）：0-sites/{support}.json
+SITES_DIR = "0-sites"
+
+
+def sites_file(support_name):
+    return os.path.join(SITES_DIR, f"{support_name}.json")
+
+
+def is_site_label(site):
+    """
+    位点是 enumerate_sites 给出的标签（如 hollow0），而不是原子编号。
+    """
+    return not str(site).isdigit()
+
+
+def enumerate_sites(structure, positions=SITE_POSITIONS, num_layers=SITE_LAYERS, symm_reduce=SYMM_REDUCE,
+                    near_reduce=NEAR_REDUCE):
+    """
+    用 AdsorbateSiteFinder 列出表面层上的 top / bridge / hollow 位点，并按 slab 的对称操作合并等价位点。
+
+    :param structure: slab 结构（不修改）
+    :param positions: 位点类型
+    :param num_layers: 构成位点的表面原子层数，这些层标记为 surface
+    :param symm_reduce: 对称等价判断的阈值，0 表示不约化
+    :return: [{"label", "kind", "frac_coords", "coords", "nearest"}, ...]，coords 为表面上的位点（高度为 0），
+        nearest 为最近的表面原子 [编号, 元素]；标签按类型编号，如 ontop0、bridge1、hollow0
+    """
+    from pymatgen.analysis.adsorption import AdsorbateSiteFinder
+
+    structure = structure.copy()
+    label_surface(structure, num_layers)
+    finder = AdsorbateSiteFinder(structure)
+    found = finder.find_adsorption_sites(distance=0, symm_reduce=symm_reduce, near_reduce=near_reduce,
+                                         positions=list(positions))
+    surface = [index for index, label in enumerate(structure.site_properties["surface_properties"])
+               if label == "surface"]
+    sites = []
+    for kind in positions:
+        for number, coords in enumerate(found.get(kind, [])):
+            frac_coords = structure.lattice.get_fractional_coords(coords)
+            nearest = min(surface, key=lambda index: structure.lattice.get_distance_and_image(
+                structure[index].frac_coords, frac_coords)[0])
+            sites.append({"label": f"{kind}{number}", "kind": kind,
+                          "frac_coords": [float(x) for x in frac_coords],
+                          "coords": [float(x) for x in coords],
+                          "nearest": [nearest, structure[nearest].species_string]})
+    return sites
+
+
+def find_sites(support_name, positions=None, refresh=False):
+    """
+    返回 support_name 的对称性独立吸附位点，结果保存在 0-sites/{support_name}.json 中，之后直接读取。
+    优化后的 ./{support_name}/CONTCAR 存在时由其枚举，否则由 ./{support_name}.cif 枚举
+    （结构优化不改变晶格，ISIF = 1，位点以分数坐标保存，可用于优化后的结构）。
+
+    :param positions: 位点类型，None 时使用已保存的结果或 SITE_POSITIONS；与已保存的类型不同时重新枚举
+    :param refresh: 为 True 时重新枚举
+    """
+    path = sites_file(support_name)
+    if os.path.isfile(path) and not refresh:
+        with open(path) as f:
+            data = json.load(f)
+        if positions is None or list(positions) == data["positions"]:
+            return data["sites"]
+    from pymatgen.core import Structure
+
+    positions = positions or SITE_POSITIONS
+    source = os.path.join('.', support_name, 'CONTCAR')
+    if not os.path.isfile(source):
+        source = os.path.join('.', support_name + '.cif')
+    sites = enumerate_sites(Structure.from_file(source), positions)
+    os.makedirs(SITES_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"support": support_name, "source": source, "positions": list(positions), "sites": sites}, f,
+                  indent=1)
+    return sites
+
+
+def site_labels(support_name, positions=None):
+    return [site["label"] for site in find_sites(support_name, positions)]
+
+
+def site_position(structure, support_name, site):
+    """
+    位点在 structure 中的笛卡尔坐标：原子编号取该原子的坐标，位点标签取 0-sites/{support_name}.json 中的位点。
+    """
+    if not is_site_label(site):
+        return structure[int(site)].coords
+    for entry in find_sites(support_name):
+        if entry["label"] == site:
+            return structure.lattice.get_cartesian_coords(entry["frac_coords"])
+    raise ValueError(f"Unknown adsorption site {site} for {support_name}; see {sites_file(support_name)}")
+
+
+if __name__ == "__main__":
+    # 用法: python sites.py <support> [--positions ontop,bridge,hollow] [--refresh]
+    #   枚举对称性独立的吸附位点，打印标签、类型、分数坐标与最近的表面原子
+    support_name = sys.argv[1]
+    args = sys.argv[2:]
+    positions = args[args.index("--positions") + 1].split(",") if "--positions" in args else None
+    sites = find_sites(support_name, positions, refresh="--refresh" in args)
+    for site in sites:
+        frac = " ".join(f"{x:.4f}" for x in site["frac_coords"])
+        print(f"{site['label']}\t{site['kind']}\t{frac}\t{site['nearest'][1]}{site['nearest'][0]}")
+    print(f"{len(sites)} unique site(s) written to {sites_file(support_name)}")
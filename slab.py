@@ -1,109 +1,89 @@
 #!/public23/home/a21000011/conda_envs/pymatgen_env/bin/python
 import warnings
-import numpy as np
 import sys
 import os
-from pymatgen.analysis.adsorption import AdsorbateSiteFinder
-from pymatgen.io.vasp import Poscar
-from pymatgen.core import Lattice, Molecule, Structure
-from pymatgen.core.surface import generate_all_slabs
-from pymatgen.ext.matproj import MPRester
-from pymatgen.io.vasp.sets import MPRelaxSet
-from pymatgen.io.vasp.sets import MITRelaxSet
-from pymatgen.io.vasp.sets import MPNonSCFSet
-from pymatgen.io.vasp.inputs import Kpoints
+
+from layers import find_layers, surface_labels, build_selective_dynamics
 
 warnings.simplefilter("ignore")
 
-# 定义变量
-support_name = sys.argv[1]
-#support_path = os.path.join('.', support_name, 'POSCAR')
-support_path = os.path.join('.', sys.argv[1] + '.cif')
-structure = Structure.from_file(support_path)
-
-# 保存路径
-relax_path = os.path.join('.', support_name)
-
-# 接收命令行传递的变量
-if len(sys.argv) > 2:
-    num_top_layers = int(sys.argv[2])  # 传递的 top 层数
-else:
-    num_top_layers = 3  # 默认值为 3
-
-# 读取笛卡尔坐标
-cart_coords = structure.cart_coords
-z_coords = cart_coords[:, 2]
-
-# 将 z 坐标进行分层
-eps = 0.5  # 阈值：两个原子属于同一层的最大距离
-labels = np.full(len(z_coords), -1, dtype=int)
-current_label = 0
-
-for i in range(len(z_coords)):
-    if labels[i] == -1:  # 如果尚未被标签
-        labels[i] = current_label
-        for j in range(i + 1, len(z_coords)):
-            if labels[j] == -1 and abs(z_coords[i] - z_coords[j]) <= eps:
-                labels[j] = current_label
-        current_label += 1
-
-layers = []
-for label in np.unique(labels):
-    layer_indices = np.where(labels == label)[0]
-    layers.append(layer_indices)
-
-# z坐标从大到小排序，例如 top 层应对 layer 1
-layers = sorted(layers, key=lambda layer: np.mean(z_coords[layer]), reverse=True)
-num_layers = len(layers)
-print(f"Total number of layers in the z direction: {num_layers}\n")
-
-# 打印每一层的原子信息
-for layer_index, layer in enumerate(layers):
-    print(f"Layer {layer_index + 1}:")
-    for index in layer:
-        atom = structure.sites[index]
-        print(f"  Atom Index: {index}, Element: {atom.species_string}, Z-Coordinate: {z_coords[index]:.3f}")
-    print()
-
-# 分层并标记 surface与subsurface
-if num_layers <= num_top_layers:
-    top_layers = layers[:num_layers]
-    bottom_layers = []
-else:
-    top_layers = layers[:num_top_layers]
-    bottom_layers = layers[num_top_layers:]
-
-surface_properties = ["subsurface"] * len(structure.sites)
-
-for layer in top_layers:
-    for index in layer:
-        surface_properties[index] = "surface"
-
-structure.add_site_property("surface_properties", surface_properties)
-
-# 由所标记的标签，设置原子是否为T或F
-group = structure.site_properties["surface_properties"]
-selective_dynamics = []
-for i, site in enumerate(structure):
-    # 根据组别设置 selective_dynamics 信息
-    if group[i] == "surface":
-        selective_dynamics.append([True, True, True])  # 表面原子动
-    elif group[i] == "subsurface":
-        selective_dynamics.append([False, False, False])  # 次表面原子不动
-    else:
-        # 对于其他的组别，默认为不动
-        selective_dynamics.append([False, False, False])
-
-# 添加 `selective_dynamics` 信息
-structure.add_site_property("selective_dynamics", selective_dynamics)
-
-print(f"Total number of layers in the z direction: {num_layers}\n")
-
-# 生成 vasp 输入文件
-#kpoints_set = {'reciprocal_density':100}
-kpoints_set = Kpoints.gamma_automatic([1, 1, 1])
-incar_set = { 'ALGO':"Normal", 'EDIFFG':-0.02,'EDIFF':0.00001, 'ENCUT':400, 'ISMEAR':0, 'ISPIN':2, 'ICHARG':2, 'NSW':400,'LCHARG':False, 'LWAVE':False,
-         'PREC':'Normal', 'NCORE':4, 'ISIF':1, 'NELM':200, 'LDAU': False}
-#Relax = MPRelaxSet(structure, user_incar_settings=incar_set, user_kpoints_settings=kpoints_set)
-Relax = MITRelaxSet(structure, user_incar_settings=incar_set, user_kpoints_settings=kpoints_set)
-Relax.write_input(relax_path)
+# 结构优化的 INCAR 设置，slab 与吸附物计算共用
+RELAX_INCAR = {'ALGO': "Normal", 'EDIFFG': -0.02, 'EDIFF': 0.00001, 'ENCUT': 400, 'ISMEAR': 0, 'ISPIN': 2,
+               'ICHARG': 2, 'NSW': 400, 'LCHARG': False, 'LWAVE': False, 'PREC': 'Normal', 'NCORE': 4, 'ISIF': 1,
+               'NELM': 200, 'LDAU': False}
+NUM_TOP_LAYERS = 3  # 默认放开 top 层数
+LAYER_EPS = 0.5  # 阈值：两个原子属于同一层的最大距离
+
+
+def write_relax_input(structure, relax_path):
+    """
+    按 RELAX_INCAR 与 Gamma 点 K 点生成结构优化的 VASP 输入文件。
+
+    :return: 输入集（可由 potcar_symbols 与 poscar.natoms 计算 NELECT）
+    """
+    from pymatgen.io.vasp.sets import MITRelaxSet
+    from pymatgen.io.vasp.inputs import Kpoints
+
+    #kpoints_set = {'reciprocal_density':100}
+    kpoints_set = Kpoints.gamma_automatic([1, 1, 1])
+    #Relax = MPRelaxSet(structure, user_incar_settings=RELAX_INCAR, user_kpoints_settings=kpoints_set)
+    relax = MITRelaxSet(structure, user_incar_settings=RELAX_INCAR, user_kpoints_settings=kpoints_set)
+    relax.write_input(relax_path)
+    return relax
+
+
+def label_surface(structure, num_top_layers=NUM_TOP_LAYERS, eps=LAYER_EPS):
+    """
+    按 z 坐标分层，将前 num_top_layers 层标记为 surface，其余为 subsurface（写入 surface_properties）。
+
+    :return: 层列表，z坐标从大到小排序，例如 top 层应对 layer 1
+    """
+    z_coords = structure.cart_coords[:, 2]
+    layers = find_layers(z_coords, eps)
+    structure.add_site_property("surface_properties", surface_labels(len(structure.sites), layers, num_top_layers))
+    return layers
+
+
+def build_slab(support_name, num_top_layers=NUM_TOP_LAYERS, verbose=True):
+    """
+    由 ./{support_name}.cif 生成 slab 结构优化输入 ./{support_name}：表面原子动，次表面及其他组别不动。
+
+    :param support_name: 催化剂名称
+    :param num_top_layers: 放开的 top 原子层数
+    :param verbose: 是否打印分层信息
+    :return: 计算目录路径
+    """
+    from pymatgen.core import Structure
+
+    support_path = os.path.join('.', support_name + '.cif')
+    structure = Structure.from_file(support_path)
+
+    # 保存路径
+    relax_path = os.path.join('.', support_name)
+
+    layers = label_surface(structure, int(num_top_layers))
+    if verbose:
+        z_coords = structure.cart_coords[:, 2]
+        print(f"Total number of layers in the z direction: {len(layers)}\n")
+        # 打印每一层的原子信息
+        for layer_index, layer in enumerate(layers):
+            print(f"Layer {layer_index + 1}:")
+            for index in layer:
+                atom = structure.sites[index]
+                print(f"  Atom Index: {index}, Element: {atom.species_string}, Z-Coordinate: {z_coords[index]:.3f}")
+            print()
+
+    # 由所标记的标签，设置原子是否为T或F
+    group = structure.site_properties["surface_properties"]
+    structure.add_site_property("selective_dynamics", build_selective_dynamics(group, movable=("surface",)))
+
+    # 生成 vasp 输入文件
+    write_relax_input(structure, relax_path)
+    return relax_path
+
+
+if __name__ == "__main__":
+    # 用法: python slab.py <support_name> [num_top_layers]
+    support_name = sys.argv[1]
+    num_top_layers = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_TOP_LAYERS
+    build_slab(support_name, num_top_layers)
@@ -0,0 +1,264 @@
+import os
+import subprocess
+import time
+import datetime
+import getpass
+import sys
+from contextlib import contextmanager
+
+
+def log_info(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] INFO: {message}")
+
+
+def log_error(message):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ERROR: {message}", file=sys.stderr)
+
+
+# 作业离开队列后的状态（sacct 不可用时使用）
+GONE = "GONE"
+
+
+class JobPoller:
+    """
+    批量查询作业状态：每个轮询周期只查询一次队列（_squeue，由调度后端实现），
+    并将状态变化通知给订阅者，避免每个作业单独查询一次。
+    保存最近一次查询到的整个队列：轮询间隔内对任何作业（跟踪与否）的查询都由该快照回答，
+    快照中有的作业在队列中，没有且不是刚提交的作业已离开队列；快照过期时才重新查询。
+
+    作业离开队列（GONE 或 _final_states 给出的最终状态）并通知订阅者后即不再跟踪，其状态只保留到下一次轮询。
+    上一次轮询之后才提交、队列中尚未列出的作业（squeue 在提交后短时间内可能查不到）视为 PENDING，
+    之后的轮询中仍未列出时才判为已离开队列。
+
+    :param interval: 初始轮询间隔（秒）
+    :param max_interval: 轮询间隔上限（秒）
+    :param backoff: 没有状态变化时轮询间隔的放大倍数，有变化时恢复初始值
+    """
+
+    def __init__(self, interval=60, max_interval=600, backoff=1.5):
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.current_interval = interval
+        self.states = {}
+        self.active = set()
+        # 上一次轮询之后提交的作业号，与最近一次轮询中离开队列的作业的最终状态
+        self.submitted = set()
+        self.finished = {}
+        # 最近一次查询到的队列 {作业号: 状态} 与查询时间
+        self.snapshot = {}
+        self.last_poll = None
+        # hold() 期间：进入时的轮询时间，之后轮询过一次即不再重新查询
+        self.held = False
+        self.hold_poll = None
+        self.subscribers = []
+        self.squeue_calls = 0
+
+    def track(self, job_id):
+        job_id = str(job_id)
+        if job_id not in self.finished:
+            self.states.setdefault(job_id, None)
+        return job_id
+
+    def note_submission(self, job_id):
+        """
+        登记刚提交的作业：下一次轮询时 squeue 还没有列出它也视为 PENDING。
+        """
+        self.submitted.add(str(job_id))
+
+    def tasks(self, job_id):
+        """
+        作业在队列中占用的任务数：普通作业与 job array 的单个任务为 1，整个 job array 为其任务数。
+        """
+        return 1
+
+    def untrack(self, job_id):
+        self.states.pop(str(job_id), None)
+
+    def subscribe(self, callback):
+        """
+        注册状态变化回调，参数为 (job_id, 旧状态, 新状态)。
+        """
+        self.subscribers.append(callback)
+
+    def _publish(self, job_id, old, new):
+        for callback in self.subscribers:
+            try:
+                callback(job_id, old, new)
+            except Exception as e:
+                log_error(f"Subscriber failed for job {job_id}: {e}")
+
+    def _squeue(self):
+        """
+        查询队列中的作业：{作业号: 状态}，job array 的任务与 job array 本身各占一项。
+        """
+        raise NotImplementedError
+
+    def _final_states(self, job_ids):
+        """
+        刚离开队列的作业的最终状态 {作业号: 状态}；没有的作业记为 GONE。
+        """
+        return {}
+
+    def poll(self):
+        """
+        刷新所有跟踪作业的状态。
+
+        :return: 本次轮询中状态发生变化的作业数
+        """
+        try:
+            queue = self._squeue()
+        except (subprocess.CalledProcessError, OSError) as e:
+            # squeue 失败时保留上一次的状态，不把作业误判为已结束
+            log_error(f"squeue failed, keeping previous job states: {e}")
+            return 0
+        self.last_poll = time.monotonic()
+        self.snapshot = queue
+        submitted, self.submitted = self.submitted, set()
+        changes = {}
+        finished = []
+        unlisted = set()
+        for job_id, old in self.states.items():
+            if job_id in queue:
+                new = queue[job_id]
+            elif job_id in submitted:
+                # 刚提交、squeue 尚未列出
+                new = "PENDING"
+                unlisted.add(job_id)
+            elif old is None or job_id in self.active:
+                new = GONE
+                finished.append(job_id)
+            else:
+                new = old
+            if new != old:
+                changes[job_id] = new
+        self.active = {job_id for job_id in self.states if job_id in queue} | unlisted
+        if finished:
+            final = self._final_states(finished)
+            for job_id in finished:
+                changes[job_id] = final.get(job_id, GONE)
+        for job_id, new in changes.items():
+            old = self.states[job_id]
+            self.states[job_id] = new
+            self._publish(job_id, old, new)
+        # 已离开队列的作业不再跟踪，最终状态保留到下一次轮询
+        self.finished = {job_id: self.states.pop(job_id) for job_id in finished}
+        if changes:
+            self.current_interval = self.interval
+        else:
+            self.current_interval = min(self.current_interval * self.backoff, self.max_interval)
+        return len(changes)
+
+    def expired(self):
+        if self.last_poll is None:
+            return True
+        if self.held and self.last_poll != self.hold_poll:
+            return False
+        return time.monotonic() - self.last_poll >= self.interval
+
+    @contextmanager
+    def hold(self):
+        """
+        with 块内（如依赖图的一轮调度）的所有查询共用一个队列快照：快照过期时只在第一次查询时轮询一次，
+        即使这一轮耗时超过轮询间隔。
+        """
+        self.held, self.hold_poll = True, self.last_poll
+        try:
+            yield
+        finally:
+            self.held = False
+
+    def state(self, job_id):
+        """
+        作业的当前状态，由最近一次队列快照回答，快照过期时先轮询一次。
+        不会跟踪作业（需要状态变化通知时先调用 track）。
+        """
+        job_id = str(job_id)
+        if self.expired():
+            self.poll()
+        if self.states.get(job_id) is not None:
+            return self.states[job_id]
+        if job_id in self.snapshot:
+            return self.snapshot[job_id]
+        if job_id in self.submitted or job_id in self.active:
+            return "PENDING"
+        return self.finished.get(job_id, GONE)
+
+    def is_active(self, job_id):
+        """
+        作业是否仍在队列中（排队或运行）。同一轮询周期内的多次查询共享一次 squeue 结果。
+        """
+        job_id = str(job_id)
+        if self.expired():
+            self.poll()
+        return job_id in self.snapshot or job_id in self.submitted or job_id in self.active
+
+    def sleep(self):
+        time.sleep(self.current_interval)
+
+    def wait(self, job_ids):
+        """
+        等待所有给定作业离开队列，期间按退避策略轮询。
+        """
+        pending = [self.track(job_id) for job_id in job_ids]
+        while True:
+            pending = [job_id for job_id in pending if self.is_active(job_id)]
+            if not pending:
+                return
+            log_info(f"Waiting for {len(pending)} job(s): {', '.join(pending)}")
+            self.sleep()
+            self.poll()
+
+
+class SlurmPoller(JobPoller):
+    """
+    批量查询 SLURM 作业状态：每个轮询周期只调用一次 squeue（可选一次 sacct）。
+
+    :param use_sacct: 作业离开队列后是否调用 sacct 获取最终状态（COMPLETED/TIMEOUT/FAILED 等）
+    :param user: 查询的用户名，默认当前用户
+    :param poller_options: JobPoller 的轮询参数
+    """
+
+    def __init__(self, use_sacct=False, user=None, **poller_options):
+        super().__init__(**poller_options)
+        self.use_sacct = use_sacct
+        self.user = user or os.environ.get("USER") or getpass.getuser()
+        self.sacct_calls = 0
+
+    def _squeue(self):
+        self.squeue_calls += 1
+        # -r：job array 的每个任务单独一行，如 "123_4 PENDING"
+        output = subprocess.check_output(['squeue', '-h', '-r', '-u', self.user, '-o', '%i %T'],
+                                         stderr=subprocess.DEVNULL).decode()
+        queue = {}
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) >= 2:
+                queue[fields[0]] = fields[1]
+                # 只要还有任务在队列中，job array 本身就视为未结束
+                if '_' in fields[0]:
+                    array_id = fields[0].split('_')[0]
+                    if queue.get(array_id) != "RUNNING":
+                        queue[array_id] = fields[1]
+        return queue
+
+    def _sacct(self, job_ids):
+        self.sacct_calls += 1
+        output = subprocess.check_output(['sacct', '-n', '-P', '-X', '-o', 'JobID,State', '-j', ','.join(job_ids)],
+                                         stderr=subprocess.DEVNULL).decode()
+        final = {}
+        for line in output.splitlines():
+            fields = line.split('|')
+            if len(fields) >= 2:
+                # 例如 "CANCELLED by 1234"，只保留状态关键字
+                final[fields[0]] = fields[1].split()[0] if fields[1] else GONE
+        return final
+
+    def _final_states(self, job_ids):
+        if not self.use_sacct:
+            return {}
+        try:
+            return self._sacct(job_ids)
+        except (subprocess.CalledProcessError, OSError) as e:
+            log_error(f"sacct failed: {e}")
+            return {}
@@ -0,0 +1,91 @@
+import re
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from outcar import reverse_lines
+
+# 物理常数（eV 单位）
+KB = 8.617333262e-5          # 玻尔兹曼常数，eV/K
+CM_TO_EV = 1.239841984e-4    # 1 cm-1 对应的能量，eV
+
+# 低于该值的实频率按该值处理（与 vaspkit 501 的默认修正一致），单位 cm-1
+LOW_FREQUENCY_CUTOFF = 50.0
+DEFAULT_TEMPERATURE = 298.15
+
+FREQUENCY_PATTERN = re.compile(rb"^\s*\d+\s+f(/i)?\s*=.*?([\d.]+)\s+cm-1")
+
+# 谐振子近似下的吸附物热力学量（eV），temperature 之外的字段与 temperature 形状相同
+HarmonicThermo = namedtuple("HarmonicThermo", ["temperature", "zpe", "u_vib", "ts", "gcorr"])
+
+
+def read_frequencies(path):
+    """
+    从 IBRION=5 的 OUTCAR 末尾读取振动频率（cm-1）。
+
+    :param path: OUTCAR 文件路径
+    :return: (实频率列表, 虚频率列表)
+    """
+    real, imaginary = [], []
+    found = False
+    with open(path, "rb") as f:
+        for line in reverse_lines(f):
+            match = FREQUENCY_PATTERN.match(line)
+            if match:
+                found = True
+                (imaginary if match.group(1) else real).append(float(match.group(2)))
+            elif found and b"Eigenvectors" in line:
+                # OUTCAR 中频率列出两遍，读完最后一组即停止
+                break
+    if not found:
+        raise ValueError(f"No vibrational frequencies found in {path}")
+    return real[::-1], imaginary[::-1]
+
+
+def harmonic_thermo(frequencies, temperatures=DEFAULT_TEMPERATURE, cutoff=LOW_FREQUENCY_CUTOFF):
+    """
+    谐振子近似计算 ZPE、振动内能、熵项与 G 校正：Gcorr = ZPE + U_vib(T) - T*S_vib(T)。
+    对所有温度一次性向量化计算。
+
+    :param frequencies: 实频率（cm-1），虚频率应事先去除
+    :param temperatures: 温度（K），标量或数组
+    :param cutoff: 低频修正阈值（cm-1），低于该值的频率按该值计算
+    :return: HarmonicThermo
+    """
+    energies = np.maximum(np.asarray(frequencies, dtype=float), cutoff) * CM_TO_EV
+    temperature = np.asarray(temperatures, dtype=float)
+    kt = KB * temperature[..., np.newaxis]
+    x = energies / kt
+    zpe = 0.5 * energies.sum()
+    u_vib = (energies / np.expm1(x)).sum(axis=-1)
+    s_vib = KB * (x / np.expm1(x) - np.log1p(-np.exp(-x))).sum(axis=-1)
+    ts = temperature * s_vib
+    zpe = np.full_like(temperature, zpe)
+    return HarmonicThermo(temperature, zpe, u_vib, ts, zpe + u_vib - ts)
+
+
+def gcorr(path, temperature=DEFAULT_TEMPERATURE, cutoff=LOW_FREQUENCY_CUTOFF):
+    """
+    代替 getG.sh 中的 vaspkit 501：返回 thermal OUTCAR 在给定温度下的 G 校正（eV）。
+    """
+    real, _ = read_frequencies(path)
+    return float(harmonic_thermo(real, temperature, cutoff).gcorr)
+
+
+if __name__ == "__main__":
+    # 用法: python thermo.py [OUTCAR] [T1 T2 ...]
+    #   只给出一个温度（默认 298.15 K）时只打印 Gcorr，否则打印各温度下的 ZPE、U_vib、TS 与 Gcorr
+    args = sys.argv[1:]
+    path = args.pop(0) if args and not args[0].replace('.', '', 1).isdigit() else "OUTCAR"
+    temperatures = [float(t) for t in args] or [DEFAULT_TEMPERATURE]
+    real, imaginary = read_frequencies(path)
+    if imaginary:
+        print(f"Warning: {len(imaginary)} imaginary mode(s) ignored: {imaginary}", file=sys.stderr)
+    result = harmonic_thermo(real, temperatures)
+    if len(temperatures) == 1:
+        print(f"{result.gcorr[0]:.6f}")
+    else:
+        print("T(K)\tZPE(eV)\tU_vib(eV)\tTS(eV)\tGcorr(eV)")
+        for row in zip(*result):
+            print("\t".join(f"{value:.6f}" if i else f"{value:.2f}" for i, value in enumerate(row)))
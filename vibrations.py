@@ -0,0 +1,254 @@
+import os
+import re
+import sys
+import json
+import shutil
+
+import numpy as np
+
+from restart import read_incar, update_incar
+import thermo
+
+# 有限差分频率计算：将 IBRION = 5 的热力学计算拆为独立的位移单点计算（disp-000、disp-001 …），
+# 以 job array 并行运行，再由各单点的受力组装 Hessian 并求振动频率。
+DISPLACEMENTS_FILE = "displacements.json"
+VIBRATIONS_FILE = "vibrations.json"
+LIST_FILE = "displacements.list"
+DISPLACEMENT_DIR = "disp-{:03d}"
+
+# 位移步长（Å）取自 INCAR 的 POTIM，INCAR 中没有时使用 VASP IBRION = 5 的默认值
+STEP = 0.015
+# 每个自由度的位移（以 STEP 为单位）与求一阶导数的差分系数（再除以 STEP），NFREE 取自 INCAR
+STENCILS = {
+    2: ((1, -1), (0.5, -0.5)),
+    4: ((1, -1, 2, -2), (8 / 12, -8 / 12, -1 / 12, 1 / 12)),
+}
+# 单点计算的 INCAR 修改
+SINGLE_POINT_INCAR = {"IBRION": -1, "NSW": 0}
+# sqrt(eV / (Å^2 amu)) 对应的波数（cm-1）
+EIGENVALUE_TO_CM = 521.4709
+
+POMASS_PATTERN = re.compile(r"POMASS\s*=\s*([\d.]+)")
+FORCE_HEADER = "TOTAL-FORCE (eV/Angst)"
+
+
+def read_poscar(path):
+    """
+    读取 VASP5 格式的 POSCAR / CONTCAR。
+
+    :return: dict(comment, lattice, symbols, counts, positions（笛卡尔坐标，Å）, movable（N x 3 布尔数组，
+        没有 Selective dynamics 时全部为 True）)
+    """
+    with open(path) as f:
+        lines = f.read().splitlines()
+    scale = float(lines[1].split()[0])
+    lattice = np.array([[float(x) for x in lines[i].split()[:3]] for i in range(2, 5)]) * scale
+    symbols = lines[5].split()
+    counts = [int(count) for count in lines[6].split()]
+    row = 7
+    selective = lines[row].strip()[:1] in ("s", "S")
+    if selective:
+        row += 1
+    cartesian = lines[row].strip()[:1] in ("c", "C", "k", "K")
+    row += 1
+    n_atoms = sum(counts)
+    fields = [lines[row + i].split() for i in range(n_atoms)]
+    coords = np.array([[float(x) for x in field[:3]] for field in fields])
+    positions = coords * scale if cartesian else coords @ lattice
+    if selective:
+        movable = np.array([[flag.upper().startswith("T") for flag in field[3:6]] for field in fields])
+    else:
+        movable = np.ones((n_atoms, 3), dtype=bool)
+    return {"comment": lines[0], "lattice": lattice, "symbols": symbols, "counts": counts,
+            "positions": positions, "movable": movable}
+
+
+def write_poscar(path, poscar, positions):
+    """
+    按 poscar 的晶格、元素与 Selective dynamics 写出给定笛卡尔坐标的 POSCAR。
+    """
+    lines = [poscar["comment"], "1.0"]
+    lines += ["  " + " ".join(f"{x:.10f}" for x in vector) for vector in poscar["lattice"]]
+    lines += ["  " + " ".join(poscar["symbols"]), "  " + " ".join(str(count) for count in poscar["counts"])]
+    lines += ["Selective dynamics", "Cartesian"]
+    for position, movable in zip(positions, poscar["movable"]):
+        flags = " ".join("T" if flag else "F" for flag in movable)
+        lines.append("  " + " ".join(f"{x:.10f}" for x in position) + f"  {flags}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def read_masses(potcar_path, symbols):
+    """
+    按 POTCAR 中各赝势的 POMASS 给出原子质量（amu），与 VASP 一致；POTCAR 中没有时取 pymatgen 的原子质量。
+    """
+    masses = []
+    if os.path.isfile(potcar_path):
+        with open(potcar_path) as f:
+            masses = [float(mass) for mass in POMASS_PATTERN.findall(f.read())]
+    if len(masses) != len(symbols):
+        from pymatgen.core import Element
+        masses = [float(Element(symbol.split("_")[0]).atomic_mass) for symbol in symbols]
+    return masses
+
+
+def read_forces(outcar_path, n_atoms):
+    """
+    读取 OUTCAR 中最后一组 TOTAL-FORCE（eV/Å）。
+    """
+    with open(outcar_path) as f:
+        lines = f.read().splitlines()
+    for index in range(len(lines) - 1, -1, -1):
+        if FORCE_HEADER in lines[index]:
+            rows = lines[index + 2:index + 2 + n_atoms]
+            return np.array([[float(x) for x in row.split()[3:6]] for row in rows])
+    raise ValueError(f"No forces found in {outcar_path}")
+
+
+def write_displacements(directory, step=None):
+    """
+    由热力学计算目录（r2t.sh 与 thermal.py 生成的 INCAR、POSCAR、KPOINTS、POTCAR）生成位移单点计算：
+    Selective dynamics 中可移动的每个自由度按 NFREE（2 或 4）沿正负方向各位移 1（与 2）个步长，
+    每个位移一个 disp-XXX 目录，INCAR 改为单点计算。位移方案写入 displacements.json。
+
+    :param directory: 热力学计算目录，如 ../OH/2-thermal/Fe
+    :param step: 位移步长（Å），None 时取 INCAR 的 POTIM（没有时为 STEP）
+    :return: 位移目录列表（绝对路径）
+    """
+    poscar = read_poscar(os.path.join(directory, "POSCAR"))
+    incar = read_incar(os.path.join(directory, "INCAR"))
+    nfree = int(incar.get("NFREE", "2").split()[0])
+    if step is None:
+        step = float(incar.get("POTIM", str(STEP)).split()[0])
+    if nfree not in STENCILS:
+        nfree = 2
+    shifts, _ = STENCILS[nfree]
+    dofs = [(int(atom), int(axis)) for atom, axis in np.argwhere(poscar["movable"])]
+    if not dofs:
+        raise ValueError(f"No movable atoms in {directory}/POSCAR")
+
+    directories = []
+    for dof, (atom, axis) in enumerate(dofs):
+        for number, shift in enumerate(shifts):
+            target = os.path.join(directory, DISPLACEMENT_DIR.format(dof * len(shifts) + number))
+            os.makedirs(target, exist_ok=True)
+            for name in ("INCAR", "KPOINTS", "POTCAR"):
+                shutil.copy(os.path.join(directory, name), target)
+            update_incar(os.path.join(target, "INCAR"), SINGLE_POINT_INCAR)
+            positions = poscar["positions"].copy()
+            positions[atom, axis] += shift * step
+            write_poscar(os.path.join(target, "POSCAR"), poscar, positions)
+            directories.append(os.path.abspath(target))
+
+    with open(os.path.join(directory, DISPLACEMENTS_FILE), "w") as f:
+        json.dump({"step": step, "nfree": nfree, "dofs": dofs,
+                   "directories": [os.path.basename(target) for target in directories]}, f, indent=1)
+    return directories
+
+
+def load_displacements(directory):
+    with open(os.path.join(directory, DISPLACEMENTS_FILE)) as f:
+        return json.load(f)
+
+
+def displacement_dirs(directory):
+    """
+    位移目录列表（绝对路径），顺序即 job array 的任务下标。
+    """
+    return [os.path.abspath(os.path.join(directory, name)) for name in load_displacements(directory)["directories"]]
+
+
+def archive_output(directory):
+    """
+    重新提交前将失败的 OUTCAR 保存为 OUTCAR-oldN（单点计算的 POSCAR 保持不变）。
+    """
+    outcar = os.path.join(directory, "OUTCAR")
+    if os.path.isfile(outcar):
+        number = 1
+        while os.path.exists(f"{outcar}-old{number}"):
+            number += 1
+        os.replace(outcar, f"{outcar}-old{number}")
+
+
+def hessian(directory):
+    """
+    由各位移单点的受力按差分公式组装 Hessian（eV/Å^2），只包含可移动的自由度，并对称化。
+
+    :return: (Hessian, 自由度列表 [(原子, 方向), ...])
+    """
+    scheme = load_displacements(directory)
+    _, weights = STENCILS[scheme["nfree"]]
+    dofs = [tuple(dof) for dof in scheme["dofs"]]
+    n_atoms = sum(read_poscar(os.path.join(directory, "POSCAR"))["counts"])
+    index = {dof: i for i, dof in enumerate(dofs)}
+    matrix = np.zeros((len(dofs), len(dofs)))
+    names = iter(scheme["directories"])
+    for i in range(len(dofs)):
+        derivative = np.zeros((n_atoms, 3))
+        for weight in weights:
+            derivative += weight * read_forces(os.path.join(directory, next(names), "OUTCAR"), n_atoms)
+        derivative /= scheme["step"]
+        # H_ij = -dF_j / dx_i
+        for (atom, axis), j in index.items():
+            matrix[i, j] = -derivative[atom, axis]
+    return (matrix + matrix.T) / 2, dofs
+
+
+def frequencies(directory):
+    """
+    质量加权 Hessian 的本征值给出振动频率（cm-1）。
+
+    :return: (实频率列表, 虚频率列表)，均为正值，由高到低排列
+    """
+    matrix, dofs = hessian(directory)
+    poscar = read_poscar(os.path.join(directory, "POSCAR"))
+    species_masses = read_masses(os.path.join(directory, "POTCAR"), poscar["symbols"])
+    atom_masses = np.repeat(species_masses, poscar["counts"])
+    weights = 1 / np.sqrt(np.array([atom_masses[atom] for atom, _ in dofs]))
+    eigenvalues = np.linalg.eigvalsh(matrix * np.outer(weights, weights))[::-1]
+    values = EIGENVALUE_TO_CM * np.sqrt(np.abs(eigenvalues))
+    return values[eigenvalues >= 0].tolist(), sorted(values[eigenvalues < 0].tolist(), reverse=True)
+
+
+def assemble(directory):
+    """
+    组装 Hessian 并将频率写入 vibrations.json。
+
+    :return: (实频率列表, 虚频率列表)
+    """
+    real, imaginary = frequencies(directory)
+    with open(os.path.join(directory, VIBRATIONS_FILE), "w") as f:
+        json.dump({"real_cm": real, "imaginary_cm": imaginary}, f, indent=1)
+    return real, imaginary
+
+
+def read_vibrations(directory):
+    with open(os.path.join(directory, VIBRATIONS_FILE)) as f:
+        data = json.load(f)
+    return data["real_cm"], data["imaginary_cm"]
+
+
+def gcorr(directory, temperature=thermo.DEFAULT_TEMPERATURE, cutoff=thermo.LOW_FREQUENCY_CUTOFF):
+    """
+    与 thermo.gcorr 相同，频率取自有限差分结果 vibrations.json。
+    """
+    real, _ = read_vibrations(directory)
+    return float(thermo.harmonic_thermo(real, temperature, cutoff).gcorr)
+
+
+if __name__ == "__main__":
+    # 用法: python vibrations.py <热力学计算目录> [--write | --assemble]
+    #   --write 生成位移单点目录；--assemble 由各单点的 OUTCAR 组装 Hessian 并打印频率与 Gcorr
+    directory = sys.argv[1]
+    if "--write" in sys.argv:
+        targets = write_displacements(directory)
+        print(f"{len(targets)} displaced single point(s) written; submit them with "
+              f"array-subvasp.sh {os.path.join(directory, LIST_FILE)}")
+        with open(os.path.join(directory, LIST_FILE), "w") as f:
+            f.write("".join(f"{target}\n" for target in targets))
+    else:
+        real, imaginary = assemble(directory) if "--assemble" in sys.argv else read_vibrations(directory)
+        print("Frequencies (cm-1): " + " ".join(f"{value:.1f}" for value in real))
+        if imaginary:
+            print("Imaginary (cm-1): " + " ".join(f"{value:.1f}i" for value in imaginary))
+        print(f"Gcorr({thermo.DEFAULT_TEMPERATURE} K) = {gcorr(directory):.6f} eV")
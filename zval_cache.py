@@ -0,0 +1,131 @@
+import os
+import re
+import sys
+import mmap
+import sqlite3
+import hashlib
+
+from results import RESULTS_DB
+
+# 每个赝势的 ZVAL 以 TITEL 的哈希为主键持久化缓存，按赝势符号（如 Fe_pv）查询
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS potcar_zval (
+    titel_hash TEXT PRIMARY KEY,
+    symbol     TEXT NOT NULL,
+    titel      TEXT NOT NULL,
+    zval       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_potcar_zval_symbol ON potcar_zval (symbol);
+"""
+
+TITEL_PATTERN = re.compile(rb"TITEL\s*=\s*([^\r\n]*?)\s*$", re.M)
+ZVAL_PATTERN = re.compile(rb"ZVAL\s*=\s*([-+\d.]+)")
+END_OF_DATASET = b"End of Dataset"
+# TITEL 与 ZVAL 位于每个赝势开头的 PSCTR 参数段内，先只在该范围内查找
+HEADER_BYTES = 1 << 14
+
+
+def titel_symbol(titel):
+    """
+    由 TITEL（如 "PAW_PBE Fe_pv 02Aug2007"）得到赝势符号 Fe_pv。
+    """
+    fields = titel.split()
+    return fields[1] if len(fields) > 1 else fields[0]
+
+
+def scan_zvals(path):
+    """
+    只读取 POTCAR 中每个赝势开头的 TITEL 与 ZVAL，跳过其余的径向网格数据。
+
+    :return: [(TITEL, ZVAL), ...]，与 POTCAR 中赝势的顺序一致
+    """
+    entries = []
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return entries
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = 0
+            while True:
+                end = data.find(END_OF_DATASET, position)
+                if end < 0:
+                    break
+                window = min(end, position + HEADER_BYTES)
+                titel = TITEL_PATTERN.search(data, position, window) or TITEL_PATTERN.search(data, position, end)
+                zval = ZVAL_PATTERN.search(data, position, window) or ZVAL_PATTERN.search(data, position, end)
+                if not (titel and zval):
+                    raise ValueError(f"TITEL/ZVAL not found in dataset at byte {position} of {path}")
+                entries.append((titel.group(1).decode(), float(zval.group(1))))
+                position = end + len(END_OF_DATASET)
+    if not entries:
+        raise ValueError(f"No pseudopotential found in {path}")
+    return entries
+
+
+class ZvalCache:
+    """
+    POTCAR ZVAL 缓存：同一赝势只需扫描一次 POTCAR，之后按符号直接得到 ZVAL，
+    不同电荷、不同吸附物与 far 参考的 NELECT 计算不再重复读取 POTCAR。
+
+    :param path: 缓存数据库路径，默认与结果库共用
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = os.path.abspath(path)
+        self._conn = None
+        self._zvals = {}
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def add(self, entries):
+        """
+        写入 scan_zvals 得到的 [(TITEL, ZVAL), ...]。
+        """
+        rows = [(hashlib.sha1(titel.encode()).hexdigest(), titel_symbol(titel), titel, zval)
+                for titel, zval in entries]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO potcar_zval (titel_hash, symbol, titel, zval) "
+                                  "VALUES (?, ?, ?, ?)", rows)
+        self._zvals.update((symbol, zval) for _, symbol, _, zval in rows)
+
+    def lookup(self, symbols):
+        """
+        按赝势符号返回 ZVAL 列表；任一符号未缓存时返回 None。
+        """
+        missing = [symbol for symbol in symbols if symbol not in self._zvals]
+        if missing:
+            placeholders = ", ".join("?" * len(missing))
+            self._zvals.update(self.conn.execute(
+                f"SELECT symbol, zval FROM potcar_zval WHERE symbol IN ({placeholders})", missing).fetchall())
+        if any(symbol not in self._zvals for symbol in symbols):
+            return None
+        return [self._zvals[symbol] for symbol in symbols]
+
+    def zvals(self, potcar_path, symbols=None):
+        """
+        返回 POTCAR 中各赝势的 ZVAL。已知赝势符号且均已缓存时不读取 POTCAR。
+
+        :param potcar_path: POTCAR 文件路径
+        :param symbols: 赝势符号列表（如输入集的 potcar_symbols），None 时扫描 POTCAR
+        """
+        if symbols:
+            zvals = self.lookup(symbols)
+            if zvals is not None:
+                return zvals
+        entries = scan_zvals(potcar_path)
+        self.add(entries)
+        return [zval for _, zval in entries]
+
+
+if __name__ == "__main__":
+    # 用法: python zval_cache.py [POTCAR]    打印 POTCAR 中各赝势的 TITEL 与 ZVAL 并写入缓存
+    path = sys.argv[1] if len(sys.argv) > 1 else "POTCAR"
+    entries = scan_zvals(path)
+    ZvalCache().add(entries)
+    for titel, zval in entries:
+        print(f"{titel}\t{zval}")